@@ -0,0 +1,305 @@
+"""Headless batch generation from CSV/JSONL manifests"""
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+from qr_cache import RenderCache, RenderPipeline
+from qr_output import DEFAULT_OUTPUT_PROFILE, encode_image
+from qr_render import RenderOptions, draw_qr, fit_box_size, require_logo
+from qr_verify import decoder_name, describe, is_sampled, verify_result
+from qr_vector import VECTOR_FORMATS, write_pdf, write_svg
+
+
+DEFAULT_CHUNK_SIZE = 64
+
+# Bare packed matrices, for printers and lasers that do their own styling
+MATRIX_FORMAT = 'pbm'
+
+# Columns a manifest row may have besides the RenderOptions fields
+EXTRA_COLUMNS = ('logo', 'filename', 'output')
+
+_pipeline = None
+
+
+def get_pipeline():
+    """Per-process pipeline, so consecutive rows that share content or style reuse stages"""
+    global _pipeline
+    if _pipeline is None:
+        # Batch rows are rarely repeated, so finished images are not kept
+        _pipeline = RenderPipeline(RenderCache(image_bytes=0, strict_logo=True))
+    return _pipeline
+
+
+def warn_unknown_columns(columns, warned):
+    """Print a warning the first time a column that nothing reads turns up"""
+    unknown = [column for column in columns if column not in RenderOptions._fields
+               and column not in EXTRA_COLUMNS and column not in warned]
+    if unknown:
+        warned.update(unknown)
+        print(f"Ignoring unknown manifest column(s): {', '.join(map(repr, unknown))}")
+
+
+def read_manifest(path):
+    """Yield ``(index, row)`` pairs from a CSV (with header) or JSONL manifest.
+
+    Files are read as ``utf-8-sig`` so the byte order mark Excel writes does
+    not end up in the first column name.
+    """
+    warned = set()
+    if path.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            index = 0
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if isinstance(row, str):
+                    row = {'content': row}
+                warn_unknown_columns(row, warned)
+                yield index, row
+                index += 1
+    else:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            warn_unknown_columns(reader.fieldnames or (), warned)
+            for index, row in enumerate(reader):
+                yield index, row
+
+
+def output_name(index, row, fmt):
+    """Pick the output file name for a row, honouring an explicit ``filename`` column"""
+    name = row.get('filename') or row.get('output')
+    if not name:
+        name = f"qr_{index:06d}"
+    if not os.path.splitext(name)[1]:
+        name = f"{name}.{fmt}"
+    return name
+
+
+def matrix_bytes(matrix, options, fmt, profile=DEFAULT_OUTPUT_PROFILE, img=None):
+    """Turn an encoded code into the contents of a ``fmt`` file.
+
+    Raster formats encode ``img`` if the caller already drew it, and
+    otherwise draw the matrix with ``draw_qr``. A missing or undecodable
+    logo raises for every format.
+    """
+    if fmt == MATRIX_FORMAT:
+        return matrix.to_pbm()
+    if fmt in VECTOR_FORMATS:
+        require_logo(options.logo_path)
+        if fmt == 'svg':
+            out = io.StringIO()
+            write_svg(out, matrix, options)
+            return out.getvalue().encode('utf-8')
+        out = io.BytesIO()
+        write_pdf(out, matrix, options)
+        return out.getvalue()
+    if img is None:
+        img = draw_qr(matrix, options)
+    return encode_image(img, fmt, profile, has_logo=bool(options.logo_path))
+
+
+def render_bytes(options, fmt, pipeline=None, profile=DEFAULT_OUTPUT_PROFILE):
+    """Render one code and return the encoded file contents"""
+    pipeline = pipeline or get_pipeline()
+    if fmt == MATRIX_FORMAT or fmt in VECTOR_FORMATS:
+        return matrix_bytes(pipeline.cache.encode(options), options, fmt)
+    # Raster images come from the pipeline, which reuses stages and cached images
+    return matrix_bytes(None, options, fmt, profile, pipeline.render(options))
+
+
+def render_row(index, row, out_dir, fmt, defaults=None, profile=DEFAULT_OUTPUT_PROFILE,
+               verify_rate=0, suggest=False, fit_size=None):
+    """Render and save a single manifest row, returning a result record.
+
+    The record reports the file size in ``bytes`` and, for PNG and JPEG,
+    the time spent encoding the file in ``encode_ms``. Rows picked by
+    ``verify_rate`` are decoded back and get ``scans`` (see qr_verify).
+    Without an ``out_dir`` nothing is written: the record carries the file
+    ``name`` and its ``data`` for the caller to store in a container.
+    With ``fit_size`` the box size is the largest whole number of pixels
+    per module that keeps the code within ``fit_size`` pixels.
+    """
+    result = {'index': index, 'output': None, 'error': None}
+    try:
+        options = RenderOptions.from_dict(row, defaults, require_content=True)
+        name = output_name(index, row, fmt)
+        ext = os.path.splitext(name)[1].lower().lstrip('.')
+        pipeline = get_pipeline()
+        if fit_size:
+            modules = pipeline.cache.encode(options).size
+            options = options._replace(box_size=fit_box_size(modules, options.border, fit_size))
+        img = None
+        if ext in VECTOR_FORMATS or ext == MATRIX_FORMAT:
+            data = render_bytes(options, ext, pipeline)
+        else:
+            img = pipeline.render(options)
+            start = time.perf_counter()
+            data = encode_image(img, ext, profile, has_logo=bool(options.logo_path))
+            result['encode_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        result['bytes'] = len(data)
+        if verify_rate and is_sampled(index, verify_rate):
+            # Vector and matrix outputs are checked through the equivalent raster
+            result.update(verify_result(img or pipeline.render(options), options, suggest,
+                                        pipeline.render))
+        if out_dir is None:
+            result['name'] = name
+            result['data'] = data
+            return result
+        file_path = os.path.join(out_dir, name)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        result['output'] = file_path
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def render_chunk(chunk, out_dir, fmt, defaults=None, profile=DEFAULT_OUTPUT_PROFILE,
+                 verify_rate=0, suggest=False, fit_size=None):
+    """Worker entry point: render a list of ``(index, row)`` pairs"""
+    return [render_row(index, row, out_dir, fmt, defaults, profile, verify_rate, suggest, fit_size)
+            for index, row in chunk]
+
+
+def iter_chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(rows, out_dir, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, ordered=True,
+              fmt='png', defaults=None, profile=DEFAULT_OUTPUT_PROFILE, verify_rate=0,
+              suggest=False, fit_size=None):
+    """Render ``rows`` across a process pool, yielding one result record per row.
+
+    Rows are grouped into chunks so each task amortises the inter-process
+    round trip. Only ``workers * 2`` chunks are in flight at a time, so
+    arbitrarily long manifests are streamed rather than loaded up front.
+    With ``ordered`` results come back in manifest order, otherwise as soon
+    as each chunk finishes. With ``out_dir`` set to None the records carry
+    the rendered data instead (see ``render_row``). Verification runs in
+    the workers next to rendering, on a ``verify_rate`` sample of rows.
+    ``fit_size`` sizes each code to fit a box of that many pixels.
+    """
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_chunks(rows, max(1, chunk_size))
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from render_chunk(chunk, out_dir, fmt, defaults, profile, verify_rate, suggest,
+                                    fit_size)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def submit_next():
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            pending.append(executor.submit(render_chunk, chunk, out_dir, fmt, defaults, profile,
+                                           verify_rate, suggest, fit_size))
+            return True
+
+        for _ in range(workers * 2):
+            if not submit_next():
+                break
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = [future for future in pending if future in finished]
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                submit_next()
+                yield from future.result()
+
+
+def run_cli(args):
+    """Handle ``batch`` on the command line"""
+    from qr_cli import options_from_args
+
+    defaults = options_from_args(args)
+    return write_results(args, read_manifest(args.manifest), defaults)
+
+
+def write_results(args, rows, defaults):
+    """Render ``rows`` with the output, container and verify options in ``args``.
+
+    Shared by ``batch`` and ``template``. Prints a summary and returns the
+    exit status.
+    """
+    if args.verify and decoder_name() is None:
+        print("Verification needs a QR decoder: pip install zxing-cpp (or pyzbar)")
+        return 2
+    container = None
+    if args.container == 'sprites':
+        from qr_bulk import SpriteSheetWriter, parse_grid
+        container = SpriteSheetWriter(args.output, grid=parse_grid(args.sheet_grid),
+                                      cell=args.sheet_cell, dpi=args.sheet_dpi,
+                                      bg_color=defaults.bg_color)
+    elif args.container:
+        from qr_bulk import open_container
+        container = open_container(args.container, args.output)
+    report = open(args.report, 'w', encoding='utf-8') if args.report else None
+    total = failed = total_bytes = verified = unscannable = 0
+    encode_times = []
+    try:
+        for result in run_batch(rows, None if container else args.output,
+                                workers=args.workers, chunk_size=args.chunk_size,
+                                ordered=not args.unordered, fmt=args.format,
+                                defaults=defaults, profile=args.profile,
+                                verify_rate=args.verify, suggest=args.suggest,
+                                fit_size=args.sheet_cell if args.container == 'sprites' else None):
+            total += 1
+            total_bytes += result.get('bytes', 0)
+            if 'encode_ms' in result:
+                encode_times.append(result['encode_ms'])
+            data = result.pop('data', None)
+            name = result.pop('name', None)
+            if container and data is not None:
+                try:
+                    result['output'] = container.add(name, data)
+                except Exception as e:
+                    result['error'] = f"{type(e).__name__}: {e}"
+            if result['error']:
+                failed += 1
+                print(f"Row {result['index']}: {result['error']}")
+            if 'scans' in result:
+                verified += 1
+                if not result['scans']:
+                    unscannable += 1
+                    advice = f"; {describe(result['suggestion'])}" if 'suggestion' in result else ""
+                    print(f"Row {result['index']}: does not scan{advice}")
+            if report:
+                report.write(json.dumps(result) + "\n")
+    finally:
+        if report:
+            report.close()
+        if container:
+            container.close()
+
+    print(f"Generated {total - failed} of {total} QR codes into {args.output}")
+    if total > failed:
+        summary = f"Average {total_bytes / (total - failed) / 1024:.1f} KiB per code"
+        if encode_times:
+            summary += f", {sum(encode_times) / len(encode_times):.1f} ms encoding ({args.profile} profile)"
+        print(summary)
+    if args.verify:
+        print(f"Verified {verified} codes with {decoder_name()}: {unscannable} did not scan")
+    return 1 if failed or unscannable else 0
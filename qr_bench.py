@@ -0,0 +1,257 @@
+"""Headless benchmark harness for the encode, draw, logo and save stages"""
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import string
+import sys
+import tempfile
+import time
+
+from PIL import Image
+import qrcode
+from qrcode.exceptions import DataOverflowError
+
+from qr_output import DEFAULT_OUTPUT_PROFILE, encode_image
+from qr_render import (ERROR_LEVELS, MODULE_STYLES, RenderOptions, encode, make_qr_image,
+                       add_logo_to_qr)
+from qr_vector import VECTOR_FORMATS, write_pdf, write_svg
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+DEFAULT_SIZES = (10, 100, 500, 1000, 2900)
+DEFAULT_BOX_SIZES = (10, 20)
+DEFAULT_FORMATS = ('png', 'jpg', 'svg', 'pdf')
+DEFAULT_THRESHOLD = 0.2
+
+QUICK_SWEEP = {
+    'sizes': (10, 1000),
+    'levels': ("Medium (15%)", "High (30%)"),
+    'styles': MODULE_STYLES,
+    'box_sizes': (10,),
+    'logos': (False, True),
+    'formats': ('png', 'svg'),
+}
+
+
+def payload(size):
+    """Deterministic mixed-case alphanumeric payload of ``size`` bytes"""
+    rng = random.Random(size)
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=size))
+
+
+def make_bench_logo(directory):
+    """A synthetic RGBA logo, so runs do not depend on files on disk"""
+    path = os.path.join(directory, 'bench_logo.png')
+    logo = Image.new('RGBA', (256, 256))
+    logo.putdata([(x, y, 128, 255 if (x // 32 + y // 32) % 2 else 160)
+                  for y in range(256) for x in range(256)])
+    logo.save(path)
+    return path
+
+
+def peak_rss_mb():
+    """High-water mark of the process RSS so far, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def reset_peak_rss():
+    """Restart the kernel's peak RSS counter for this process (Linux only).
+
+    Returns False where the peak cannot be reset, in which case stage peaks
+    are not reported. tracemalloc is no substitute: Pillow allocates image
+    buffers outside the Python allocator.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def proc_status_mb(field):
+    """A memory field of /proc/self/status, such as ``VmRSS`` or ``VmHWM``, in MiB"""
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples, rss):
+    peak, growth = rss or (None, None)
+    return {
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'throughput_per_s': round(len(samples) / sum(samples), 1) if sum(samples) else None,
+        'peak_rss_mb': peak,
+        'rss_growth_mb': growth,
+    }
+
+
+def case_key(case):
+    return "|".join(str(case[field]) for field in
+                    ('size', 'error_level', 'module_style', 'box_size', 'logo', 'format'))
+
+
+def run_case(case, logo_path, iterations, warmup=1, profile=DEFAULT_OUTPUT_PROFILE):
+    """Time every stage of one case, returning per-stage summaries"""
+    options = RenderOptions(
+        content=payload(case['size']),
+        error_level=case['error_level'],
+        module_style=case['module_style'],
+        logo_path=logo_path if case['logo'] else None,
+        box_size=case['box_size'],
+    )
+    timings = {}
+    rss = {}  # stage: (peak RSS while it ran, peak growth over the RSS it started with)
+
+    def timed(stage, func, *args):
+        tracked = reset_peak_rss()
+        before = proc_status_mb('VmRSS') if tracked else None
+        start = time.perf_counter()
+        value = func(*args)
+        timings.setdefault(stage, []).append(time.perf_counter() - start)
+        if tracked:
+            peak = proc_status_mb('VmHWM')
+            old_peak, old_growth = rss.get(stage, (0, 0))
+            rss[stage] = (max(old_peak, peak), max(old_growth, round(peak - before, 1)))
+        return value
+
+    for i in range(warmup + iterations):
+        matrix = timed('encode', encode, options.content, options.error_level)
+        if case['format'] in VECTOR_FORMATS:
+            writer = write_svg if case['format'] == 'svg' else write_pdf
+            out = io.StringIO() if case['format'] == 'svg' else io.BytesIO()
+            timed('save', writer, out, matrix, options)
+            size = len(out.getvalue())
+        else:
+            img = timed('draw', make_qr_image, matrix, options)
+            if options.logo_path:
+                img = timed('logo', add_logo_to_qr, img, options.logo_path, options.bg_color,
+                            False, options.logo_percent)
+            size = len(timed('save', encode_image, img, case['format'], profile,
+                             bool(options.logo_path)))
+        if i < warmup:
+            timings.clear()
+
+    stages = {stage: summarize(samples, rss.get(stage)) for stage, samples in timings.items()}
+    totals = [sum(samples[i] for samples in timings.values()) for i in range(iterations)]
+    stages['total'] = summarize(totals, tuple(map(max, zip(*rss.values()))) if rss else None)
+    return {'version': matrix.version, 'bytes': size, 'stages': stages}
+
+
+def iter_cases(sizes, levels, styles, box_sizes, logos, formats):
+    for size, level, style, box_size, logo, fmt in itertools.product(
+            sizes, levels, styles, box_sizes, logos, formats):
+        if fmt in VECTOR_FORMATS and box_size != box_sizes[0]:
+            # Vector output is resolution independent
+            continue
+        yield {'size': size, 'error_level': level, 'module_style': style,
+               'box_size': box_size, 'logo': logo, 'format': fmt}
+
+
+def run_benchmarks(cases, iterations=5, progress=None, profile=DEFAULT_OUTPUT_PROFILE):
+    """Run every case and return the JSON-serialisable report"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        logo_path = make_bench_logo(tmp)
+        for case in cases:
+            entry = {'case': case, 'key': case_key(case)}
+            try:
+                entry.update(run_case(case, logo_path, iterations, profile=profile))
+            except DataOverflowError:
+                entry['skipped'] = "payload does not fit at this error correction level"
+            results.append(entry)
+            if progress:
+                progress(entry)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pillow': Image.__version__,
+            'qrcode': getattr(qrcode, '__version__', None),
+            'iterations': iterations,
+            'profile': profile,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """List stages whose p50 grew by more than ``threshold`` relative to ``baseline``"""
+    previous = {entry['key']: entry for entry in baseline.get('results', []) if 'stages' in entry}
+    regressions = []
+    for entry in report['results']:
+        before = previous.get(entry['key'])
+        if not before or 'stages' not in entry:
+            continue
+        for stage, stats in entry['stages'].items():
+            old = before['stages'].get(stage)
+            if not old or not old['p50_ms']:
+                continue
+            change = stats['p50_ms'] / old['p50_ms'] - 1
+            if change > threshold:
+                regressions.append({'key': entry['key'], 'stage': stage,
+                                    'baseline_ms': old['p50_ms'], 'p50_ms': stats['p50_ms'],
+                                    'change': round(change, 3)})
+    return regressions
+
+
+def run_cli(args):
+    """Handle ``bench`` on the command line"""
+    sweep = dict(QUICK_SWEEP) if args.quick else {
+        'sizes': DEFAULT_SIZES,
+        'levels': tuple(ERROR_LEVELS),
+        'styles': MODULE_STYLES,
+        'box_sizes': DEFAULT_BOX_SIZES,
+        'logos': (False, True),
+        'formats': DEFAULT_FORMATS,
+    }
+    for name in ('sizes', 'levels', 'styles', 'box_sizes', 'formats'):
+        if getattr(args, name):
+            sweep[name] = tuple(getattr(args, name))
+    if args.logo is not None:
+        sweep['logos'] = (args.logo == 'on',)
+
+    def progress(entry):
+        if 'skipped' in entry:
+            print(f"{entry['key']}: skipped")
+        else:
+            total = entry['stages']['total']
+            print(f"{entry['key']}: p50 {total['p50_ms']} ms, p95 {total['p95_ms']} ms, "
+                  f"{entry['bytes']} bytes")
+
+    report = run_benchmarks(list(iter_cases(**sweep)), args.iterations, progress, args.profile)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['key']} [{r['stage']}]: {r['baseline_ms']} -> {r['p50_ms']} ms "
+                  f"(+{r['change'] * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold * 100:.0f}% against {args.baseline}")
+    return 0
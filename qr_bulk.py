@@ -0,0 +1,230 @@
+"""Bulk output containers: ZIP/TAR archives, sprite sheets and an append-only blob store"""
+import io
+import json
+import mmap
+import os
+import tarfile
+import time
+import zipfile
+
+from PIL import Image
+
+
+CONTAINERS = ('zip', 'tar', 'sprites', 'blob')
+DEFAULT_SHEET_GRID = (4, 6)
+DEFAULT_SHEET_CELL = 300
+DEFAULT_SHEET_GAP = 30
+DEFAULT_SHEET_DPI = 300
+
+# PNG and JPEG data is already compressed
+_STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class ArchiveWriter:
+    """Stream codes straight into a ZIP or TAR file, without temporary files"""
+
+    def __init__(self, path, kind='zip'):
+        self.path = path
+        self.kind = kind
+        if kind == 'zip':
+            self.archive = zipfile.ZipFile(path, 'w')
+        else:
+            self.archive = tarfile.open(path, 'w')
+
+    def add(self, name, data):
+        if self.kind == 'zip':
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = (zipfile.ZIP_STORED if name.lower().endswith(_STORED_EXTENSIONS)
+                                  else zipfile.ZIP_DEFLATED)
+            self.archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = time.time()
+            self.archive.addfile(info, io.BytesIO(data))
+        return f"{self.path}:{name}"
+
+    def close(self):
+        self.archive.close()
+
+
+class SpriteSheetWriter:
+    """Pack codes onto print-ready pages of ``cols`` x ``rows`` cells.
+
+    Pages are written as ``<prefix>_page001.png`` and so on, and
+    ``<prefix>.json`` records the page and pixel box of every code. Codes
+    are never resampled: they are centred in their cell, and ones smaller
+    than half a cell are scaled up by a whole-number factor. Render codes
+    to fit the cell (``fit_box_size``) to use all of it.
+    """
+
+    def __init__(self, prefix, grid=DEFAULT_SHEET_GRID, cell=DEFAULT_SHEET_CELL,
+                 gap=DEFAULT_SHEET_GAP, dpi=DEFAULT_SHEET_DPI, bg_color="#FFFFFF"):
+        self.prefix = os.path.splitext(prefix)[0]
+        self.cols, self.rows = grid
+        self.cell = cell
+        self.gap = gap
+        self.dpi = dpi
+        self.bg_color = bg_color
+        self.page = None
+        self.page_count = 0
+        self.slot = 0
+        self.index = []
+        directory = os.path.dirname(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def page_size(self):
+        return (self.cols * (self.cell + self.gap) + self.gap,
+                self.rows * (self.cell + self.gap) + self.gap)
+
+    def page_path(self, number):
+        return f"{self.prefix}_page{number:03d}.png"
+
+    def add(self, name, data):
+        if os.path.splitext(name)[1].lower() not in _STORED_EXTENSIONS:
+            raise ValueError(f"Sprite sheets only take PNG or JPEG codes, not {name}")
+        if self.page is None:
+            self.page = Image.new('RGB', self.page_size, self.bg_color)
+            self.page_count += 1
+            self.slot = 0
+
+        img = Image.open(io.BytesIO(data)).convert('RGB')
+        if img.width > self.cell or img.height > self.cell:
+            raise ValueError(f"{name} is {img.width}x{img.height} px, larger than the "
+                             f"{self.cell} px cell")
+        factor = self.cell // max(img.width, img.height)
+        if factor > 1:
+            img = img.resize((img.width * factor, img.height * factor), Image.Resampling.NEAREST)
+
+        row, col = divmod(self.slot, self.cols)
+        x = self.gap + col * (self.cell + self.gap) + (self.cell - img.width) // 2
+        y = self.gap + row * (self.cell + self.gap) + (self.cell - img.height) // 2
+        self.page.paste(img, (x, y))
+        self.index.append({'name': name, 'page': self.page_count, 'x': x, 'y': y,
+                           'width': img.width, 'height': img.height})
+
+        self.slot += 1
+        if self.slot == self.cols * self.rows:
+            self.flush_page()
+        return f"{self.page_path(self.page_count)}#{x},{y}"
+
+    def flush_page(self):
+        if self.page is not None:
+            self.page.save(self.page_path(self.page_count), dpi=(self.dpi, self.dpi))
+            self.page = None
+
+    def close(self):
+        self.flush_page()
+        with open(f"{self.prefix}.json", 'w', encoding='utf-8') as f:
+            json.dump({
+                'grid': [self.cols, self.rows],
+                'page_size': list(self.page_size),
+                'dpi': self.dpi,
+                'pages': [self.page_path(n) for n in range(1, self.page_count + 1)],
+                'codes': self.index,
+            }, f, indent=2)
+
+
+class BlobWriter:
+    """Append codes to a single data file plus a JSONL index of offsets.
+
+    Opening an existing store appends to it. Data is written before its
+    index entry, so an interrupted run never indexes a partial record.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.data = open(path, 'ab')
+        self.index = open(f"{path}.idx", 'a', encoding='utf-8')
+
+    def add(self, name, data):
+        offset = self.data.seek(0, os.SEEK_END)
+        self.data.write(data)
+        self.data.flush()
+        self.index.write(json.dumps({'name': name, 'offset': offset, 'length': len(data)}) + "\n")
+        return f"{self.path}@{offset}"
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+class BlobStore:
+    """Read codes back from a blob store by memory-mapping the data file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        with open(f"{path}.idx", 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    # A name written twice resolves to its latest copy
+                    self.entries[entry['name']] = (entry['offset'], entry['length'])
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def names(self):
+        return list(self.entries)
+
+    def get(self, name):
+        offset, length = self.entries[name]
+        return self._map[offset:offset + length]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_container(kind, path, **sheet_options):
+    """Create the writer for one of ``CONTAINERS``"""
+    if kind in ('zip', 'tar'):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return ArchiveWriter(path, kind)
+    if kind == 'sprites':
+        return SpriteSheetWriter(path, **sheet_options)
+    if kind == 'blob':
+        return BlobWriter(path)
+    raise ValueError(f"Unknown container: {kind}")
+
+
+def parse_grid(value):
+    """Parse ``COLSxROWS`` as given to ``--sheet-grid``"""
+    cols, _, rows = value.lower().partition('x')
+    return int(cols), int(rows)
+
+
+def run_blob_cli(args):
+    """Handle ``blob-get``: list a blob store or copy one code out of it"""
+    with BlobStore(args.store) as store:
+        if not args.name:
+            for name in store.names():
+                print(name)
+            return 0
+        if args.name not in store:
+            print(f"{args.name} is not in {args.store}")
+            return 1
+        with open(args.output or args.name, 'wb') as f:
+            f.write(store.get(args.name))
+    return 0
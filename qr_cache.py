@@ -0,0 +1,245 @@
+"""Memory-capped LRU caches and the incremental render pipeline built on them"""
+import threading
+from collections import Counter, OrderedDict
+
+from qr_render import encode, make_qr_image, add_logo_to_qr, logo_fingerprint, require_logo
+from qr_worker import RenderCancelled
+
+
+DEFAULT_MATRIX_CACHE_BYTES = 16 * 1024 * 1024
+DEFAULT_IMAGE_CACHE_BYTES = 128 * 1024 * 1024
+DEFAULT_FIT_CACHE_BYTES = 4 * 1024 * 1024
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by the estimated size of its values"""
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+
+def image_nbytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+def matrix_nbytes(matrix):
+    # Packed bits plus the object and bytes headers
+    return len(matrix.bits) + 128
+
+
+class RenderCache:
+    """Two-tier render cache.
+
+    The matrix tier maps ``(content, error level)`` to a QRMatrix so that
+    style, colour and size changes skip encoding entirely. The version and
+    mask chosen for each matrix outlive it in a much smaller tier, so even
+    an evicted matrix is re-encoded without repeating the fit search. The image
+    tier maps the full style tuple to the finished image so that returning
+    to an earlier state costs nothing. Images handed out are shared with the
+    cache and must not be modified in place.
+
+    Renders for the GUI print logo errors and carry on without the logo.
+    Headless callers set ``strict_logo`` so a missing or undecodable logo
+    raises instead.
+    """
+
+    def __init__(self, matrix_bytes=DEFAULT_MATRIX_CACHE_BYTES, image_bytes=DEFAULT_IMAGE_CACHE_BYTES,
+                 strict_logo=False):
+        self.strict_logo = strict_logo
+        self.matrices = LRUCache(matrix_bytes, matrix_nbytes)
+        self.images = LRUCache(image_bytes, image_nbytes)
+        self.fits = LRUCache(DEFAULT_FIT_CACHE_BYTES, lambda fit: 64)
+
+    @staticmethod
+    def matrix_key(options):
+        return (options.content, options.error_level)
+
+    @staticmethod
+    def image_key(options, logo=None):
+        return (options.content, options.error_level, options.module_style,
+                options.fg_color.lower(), options.bg_color.lower(), logo,
+                options.box_size, options.border, options.logo_percent)
+
+    def logo_key(self, options):
+        """The logo's fingerprint for ``image_key``; raises for a missing logo with ``strict_logo``"""
+        if self.strict_logo:
+            return require_logo(options.logo_path)
+        return logo_fingerprint(options.logo_path)
+
+    def encode(self, options):
+        key = self.matrix_key(options)
+        matrix = self.matrices.get(key)
+        if matrix is None:
+            matrix = encode(options.content, options.error_level, fit=self.fits.get(key))
+            self.matrices.put(key, matrix)
+            self.fits.put(key, matrix.fit)
+        return matrix
+
+    def render(self, options):
+        logo = self.logo_key(options)
+        key = self.image_key(options, logo)
+        img = self.images.get(key)
+        if img is None:
+            img = make_qr_image(self.encode(options), options)
+            if logo:
+                img = add_logo_to_qr(img, options.logo_path, options.bg_color,
+                                     percent=options.logo_percent, strict=self.strict_logo)
+            self.images.put(key, img)
+        return img
+
+    def clear(self):
+        self.matrices.clear()
+        self.images.clear()
+        self.fits.clear()
+
+    def stats(self):
+        return {'matrix': self.matrices.stats(), 'image': self.images.stats(),
+                'fit': self.fits.stats()}
+
+
+# Render stages in pipeline order, with the option fields each one reads
+PIPELINE_STAGES = OrderedDict([
+    ('encode', ('content', 'error_level')),
+    ('draw', ('module_style', 'fg_color', 'bg_color', 'box_size', 'border')),
+    ('logo', ('logo_path', 'bg_color', 'logo_percent')),
+])
+
+
+class StageTracker:
+    """Tracks which stages of a linear pipeline have to run again.
+
+    Invalidating a stage also invalidates every stage after it, since their
+    inputs include its output.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.dirty = set(self.stages)
+        self._lock = threading.Lock()
+
+    def invalidate(self, stage):
+        with self._lock:
+            self.dirty.update(self.stages[self.stages.index(stage):])
+
+    def is_dirty(self, stage):
+        with self._lock:
+            return stage in self.dirty
+
+    def mark_clean(self, stage):
+        with self._lock:
+            self.dirty.discard(stage)
+
+
+class RenderPipeline:
+    """Renders a stream of option sets, redoing only the stages whose inputs changed.
+
+    Each stage keeps its last result. A stage runs again when the option
+    fields it reads differ from the previous call or when a caller
+    invalidates it explicitly, for example after the logo file is replaced
+    on disk. Finished images are also looked up in and stored to ``cache``.
+    If ``is_stale`` is given it is checked between stages, and RenderCancelled
+    is raised once it returns True.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else RenderCache()
+        self.tracker = StageTracker(PIPELINE_STAGES)
+        self.stage_runs = Counter()
+        self._inputs = {}
+        self._results = {}
+
+    def invalidate(self, stage):
+        self.tracker.invalidate(stage)
+
+    def render(self, options, is_stale=None):
+        logo = self.cache.logo_key(options)
+        key = self.cache.image_key(options, logo)
+        img = self.cache.images.get(key)
+        if img is not None:
+            return img
+
+        for stage, fields in PIPELINE_STAGES.items():
+            inputs = tuple(getattr(options, field) for field in fields)
+            if stage == 'logo':
+                inputs += (logo,)
+            if inputs != self._inputs.get(stage):
+                self.tracker.invalidate(stage)
+                self._inputs[stage] = inputs
+
+        if self.tracker.is_dirty('encode'):
+            self._run('encode', self.cache.encode(options))
+        self._check_stale(is_stale)
+        if self.tracker.is_dirty('draw'):
+            self._run('draw', make_qr_image(self._results['encode'], options))
+        self._check_stale(is_stale)
+        if self.tracker.is_dirty('logo'):
+            img = self._results['draw']
+            if logo:
+                img = add_logo_to_qr(img, options.logo_path, options.bg_color,
+                                     percent=options.logo_percent,
+                                     strict=self.cache.strict_logo)
+            self._run('logo', img)
+
+        img = self._results['logo']
+        self.cache.images.put(key, img)
+        return img
+
+    @staticmethod
+    def _check_stale(is_stale):
+        if is_stale is not None and is_stale():
+            raise RenderCancelled()
+
+    def _run(self, stage, result):
+        self._results[stage] = result
+        self.stage_runs[stage] += 1
+        self.tracker.mark_clean(stage)
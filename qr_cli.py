@@ -0,0 +1,216 @@
+"""Command line entry points for running the generator without the GUI"""
+import argparse
+import sys
+
+from qr_output import DEFAULT_OUTPUT_PROFILE, OUTPUT_PROFILES
+from qr_render import (DEFAULT_ERROR_LEVEL, DEFAULT_LOGO_PERCENT, DEFAULT_MODULE_STYLE,
+                       RenderOptions, normalize_error_level, normalize_module_style)
+from qr_startup import DEFAULT_RUNS, DEFAULT_TARGET_MS, DEFAULT_THRESHOLD, DEFAULT_TOP
+from qr_styles import style_names
+
+
+def add_style_arguments(parser):
+    """Options shared by every headless mode that renders codes"""
+    parser.add_argument('--error-level', type=normalize_error_level, default=DEFAULT_ERROR_LEVEL,
+                        help="L, M, Q, H or a full label such as 'High (30%%)'")
+    parser.add_argument('--module-style', type=normalize_module_style, default=DEFAULT_MODULE_STYLE,
+                        help=f"One of {', '.join(style_names())} or a registered style")
+    parser.add_argument('--fg-color', default="#000000")
+    parser.add_argument('--bg-color', default="#FFFFFF")
+    parser.add_argument('--logo', default=None, help="Logo image placed in the centre")
+    parser.add_argument('--box-size', type=int, default=20)
+    parser.add_argument('--logo-percent', type=int, default=DEFAULT_LOGO_PERCENT,
+                        help="Logo width as a percentage of the code's width")
+
+
+def options_from_args(args, **extra):
+    """RenderOptions from the ``add_style_arguments`` options, plus any other fields in ``extra``"""
+    return RenderOptions(
+        error_level=args.error_level,
+        module_style=args.module_style,
+        fg_color=args.fg_color,
+        bg_color=args.bg_color,
+        logo_path=args.logo,
+        box_size=args.box_size,
+        logo_percent=args.logo_percent,
+        **extra
+    )
+
+
+def add_output_arguments(parser, default_output):
+    """Where and how ``batch`` and ``template`` write their codes"""
+    parser.add_argument('-o', '--output', default=default_output, help="Output directory")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument('--chunk-size', type=int, default=64,
+                        help="Rows handed to a worker at a time")
+    parser.add_argument('--unordered', action='store_true',
+                        help="Report results as they finish instead of in input order")
+    parser.add_argument('--format', default='png', choices=('png', 'jpg', 'svg', 'pdf', 'pbm'),
+                        help="Used for rows without an extension in their filename; "
+                             "pbm writes the bare packed module matrix")
+    parser.add_argument('--report', default=None, help="Write one JSON result per row to this file")
+    parser.add_argument('--container', choices=('zip', 'tar', 'sprites', 'blob'), default=None,
+                        help="Write into one archive, sprite sheet set or blob store at --output "
+                             "instead of one file per code")
+    parser.add_argument('--sheet-grid', default='4x6', help="Sprite sheet cells as COLSxROWS")
+    parser.add_argument('--sheet-cell', type=int, default=300, help="Sprite sheet cell size in px")
+    parser.add_argument('--sheet-dpi', type=int, default=300)
+
+
+def add_verify_arguments(parser):
+    parser.add_argument('--verify', type=float, nargs='?', const=1.0, default=0, metavar='RATE',
+                        help="Decode codes back to check they scan; RATE is the fraction "
+                             "checked (default 1 = every code)")
+    parser.add_argument('--suggest', action='store_true',
+                        help="For codes that do not scan, find a higher error correction "
+                             "level or smaller logo that does")
+
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', choices=OUTPUT_PROFILES, default=DEFAULT_OUTPUT_PROFILE,
+                        help="PNG/JPEG encoding trade-off between speed and file size")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='qr_code_app.py',
+                                     description="Advanced QR Code Generator (headless mode)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help="Generate codes from a CSV/JSONL manifest")
+    batch.add_argument('manifest', help="CSV with a header row, or JSONL with one object per line")
+    add_output_arguments(batch, 'qr_batch_output')
+    add_style_arguments(batch)
+    add_profile_argument(batch)
+    add_verify_arguments(batch)
+
+    template = commands.add_parser('template',
+                                   help="Render a range of ids against a template saved in the app")
+    template.add_argument('template', help="Template name, as saved from the app")
+    template.add_argument('--payload', required=True,
+                          help="Content for each id, e.g. 'https://x.example/t/{id}'")
+    template.add_argument('--ids', default=None,
+                          help="Ids and ranges such as '1-100000' or '1-9,20,30-40:2'")
+    template.add_argument('--ids-file', default=None, help="File with one id per line")
+    template.add_argument('--name', default='{id}',
+                          help="File name for each id, without extension (default: the id)")
+    template.add_argument('--settings', default='qr_settings.json',
+                          help="Settings file the templates are read from")
+    template.add_argument('--box-size', type=int, default=20)
+    add_output_arguments(template, 'qr_template_output')
+    add_profile_argument(template)
+    add_verify_arguments(template)
+
+    poster = commands.add_parser('poster', help="Render one very large code a band at a time")
+    poster.add_argument('content')
+    poster.add_argument('-o', '--output', required=True, help="PNG or TIFF file to write")
+    poster.add_argument('--band-mb', type=int, default=16,
+                        help="Approximate memory for one band of pixel rows")
+    poster.add_argument('--dpi', type=int, default=None, help="Resolution recorded in the file")
+    add_style_arguments(poster)
+    add_profile_argument(poster)
+
+    blob = commands.add_parser('blob-get', help="List a blob store or extract one code from it")
+    blob.add_argument('store', help="Blob file written by 'batch --container blob'")
+    blob.add_argument('name', nargs='?', default=None, help="Code to extract (omit to list)")
+    blob.add_argument('-o', '--output', default=None, help="Where to write the code")
+
+    stream = commands.add_parser('stream', help="Render codes from a continuous feed of lines")
+    stream.add_argument('input', nargs='?', default='-',
+                        help="JSONL or plain text file, one payload per line ('-' for stdin)")
+    stream.add_argument('-o', '--output', default='qr_stream_output', help="Output directory")
+    stream.add_argument('--follow', action='store_true',
+                        help="Keep reading lines appended to the file, like tail -f")
+    stream.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: one per CPU)")
+    stream.add_argument('--queue-size', type=int, default=256,
+                        help="Items buffered between stages before earlier stages wait")
+    stream.add_argument('--write-batch', type=int, default=64, help="Files written per batch")
+    stream.add_argument('--stats-interval', type=float, default=2.0,
+                        help="Seconds between throughput reports on stderr (0 to disable)")
+    stream.add_argument('--format', default='png', choices=('png', 'jpg', 'svg', 'pdf', 'pbm'))
+    add_style_arguments(stream)
+    add_profile_argument(stream)
+    add_verify_arguments(stream)
+
+    bench = commands.add_parser('bench', help="Benchmark encode, draw, logo and save stages")
+    bench.add_argument('-o', '--output', default='bench_results.json')
+    bench.add_argument('--baseline', default=None, help="Earlier results to compare against")
+    bench.add_argument('--threshold', type=float, default=0.2,
+                       help="Allowed p50 slowdown before a stage counts as a regression (0.2 = 20%%)")
+    bench.add_argument('--iterations', type=int, default=5)
+    bench.add_argument('--quick', action='store_true', help="Run a small representative sweep")
+    bench.add_argument('--sizes', type=int, nargs='+', help="Payload sizes in bytes")
+    bench.add_argument('--levels', type=normalize_error_level, nargs='+')
+    bench.add_argument('--styles', type=normalize_module_style, nargs='+')
+    bench.add_argument('--box-sizes', type=int, nargs='+')
+    bench.add_argument('--formats', choices=('png', 'jpg', 'svg', 'pdf'), nargs='+')
+    bench.add_argument('--logo', choices=('on', 'off'), default=None,
+                       help="Only benchmark with or without a logo (default: both)")
+    add_profile_argument(bench)
+
+    startup = commands.add_parser('startup', help="Measure how long the GUI takes to import")
+    startup.add_argument('-o', '--output', default=None, help="Write the measurement as JSON")
+    startup.add_argument('--baseline', default=None, help="Earlier measurement to compare against")
+    startup.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help="Allowed slowdown against the baseline (0.2 = 20%%)")
+    startup.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS,
+                         help="Fail when the median import takes longer than this")
+    startup.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    startup.add_argument('--top', type=int, default=DEFAULT_TOP, help="Slowest modules to list")
+
+    commands.add_parser('selfcheck', help="Check the renderers draw the same pixels as qrcode's own")
+
+    serve = commands.add_parser('serve', help="Serve QR codes over a local HTTP API")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--workers', type=int, default=None,
+                       help="Renderer processes kept warm (default: one per CPU)")
+    serve.add_argument('--logo-dir', default=None,
+                       help="Directory of logos, requested by file name without extension")
+    serve.add_argument('--cache-dir', default='qr_server_cache',
+                       help="On-disk response cache ('' to disable)")
+    serve.add_argument('--memory-cache-mb', type=int, default=64)
+    serve.add_argument('--disk-cache-mb', type=int, default=512,
+                       help="Cap on the on-disk cache; least recently used files are deleted past it")
+    serve.add_argument('--quiet', action='store_true', help="Do not log every request")
+    add_profile_argument(serve)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'batch':
+        from qr_batch import run_cli
+        return run_cli(args)
+    if args.command == 'template':
+        from qr_templates import run_cli
+        return run_cli(args)
+    if args.command == 'poster':
+        from qr_strips import run_cli
+        return run_cli(args)
+    if args.command == 'blob-get':
+        from qr_bulk import run_blob_cli
+        return run_blob_cli(args)
+    if args.command == 'stream':
+        from qr_stream import run_cli
+        return run_cli(args)
+    if args.command == 'serve':
+        from qr_server import run_cli
+        return run_cli(args)
+    if args.command == 'bench':
+        from qr_bench import run_cli
+        return run_cli(args)
+    if args.command == 'startup':
+        from qr_startup import run_cli
+        return run_cli(args)
+    if args.command == 'selfcheck':
+        from qr_selfcheck import run_cli
+        return run_cli(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,24 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, colorchooser
-import qrcode
-from qrcode.image.styledpil import StyledPilImage
-from qrcode.image.styles.moduledrawers import RoundedModuleDrawer, SquareModuleDrawer, CircleModuleDrawer
-from qrcode.image.styles.colormasks import SolidFillColorMask
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from tkinter import ttk, filedialog, messagebox, colorchooser, simpledialog
 import os
+import sys
 import json
-import time
+
+# Pillow, qrcode and the render modules are imported on first use, mostly
+# on the render thread, so the window appears before any of them load
+from qr_worker import RenderWorker
+from qr_history import AutosaveHistory, DEFAULT_HISTORY_DIR, DEFAULT_HISTORY_LIMIT
+from qr_metrics import metrics, profile_call
+
+RENDER_POLL_MS = 30
+RESIZE_DEBOUNCE_MS = 150
+
+# Shown at start-up until the first render of the session is ready
+LAST_PREVIEW_PATH = 'qr_last_preview.png'
+
+# Stages listed in the performance overlay, in pipeline order
+OVERLAY_STAGES = ('encode', 'draw', 'logo', 'thumbnail', 'photoimage', 'preview_total',
+                  'high_res_total', 'export_vector')
 
 class QRCodeGenerator:
     def __init__(self, root):
@@ -20,12 +31,45 @@ class QRCodeGenerator:
         self.logo_path = None
         self.fg_color = "#000000"
         self.bg_color = "#FFFFFF"
+        self._pipeline = None
+        self.render_worker = RenderWorker()
+        self._render_poll = None
+        self._resize_timer = None
+        self._preview_size = None
+        self._profile_mode = None
+        self._profile_generation = None
+        self.show_perf_overlay = False
+        self.autosave_history = False
+        self.history_dir = DEFAULT_HISTORY_DIR
+        self.history_limit = DEFAULT_HISTORY_LIMIT
+        self.history = None
+        self.output_profile = None
+        self.remember_last_render = True
+        self.last_render = None
+        self.templates = {}
+        self.preview_image = None
+        self.cached_preview = None
         
         self.load_settings()
+        self.update_history()
         self.setup_styles()
         self.create_widgets()
+        self.bind_shortcuts()
         self.apply_theme()
         self.center_window()
+        self.restore_last_render()
+    
+    @property
+    def pipeline(self):
+        if self._pipeline is None:
+            from qr_cache import RenderPipeline
+            self._pipeline = RenderPipeline()
+        return self._pipeline
+    
+    def invalidate(self, stage):
+        # Before the first render there is nothing cached to invalidate
+        if self._pipeline is not None:
+            self._pipeline.invalidate(stage)
     
     def setup_styles(self):
         """Setup custom styles for the application"""
@@ -159,16 +203,16 @@ class QRCodeGenerator:
         ], state='readonly', style='Custom.TCombobox')
         self.error_correction.set("Medium (15%)")
         self.error_correction.pack(fill='x', padx=10, pady=(0, 10))
-        self.error_correction.bind('<<ComboboxSelected>>', self.generate_qr)
+        self.error_correction.bind('<<ComboboxSelected>>', self.on_error_level_change)
         
 
         ttk.Label(style_frame, text="Module Style:", style='Custom.TLabel').pack(anchor='w', padx=10, pady=(5, 5))
         self.module_style = ttk.Combobox(style_frame, values=[
             "Square", "Rounded", "Circle"
-        ], state='readonly', style='Custom.TCombobox')
+        ], state='readonly', style='Custom.TCombobox', postcommand=self.refresh_module_styles)
         self.module_style.set("Square")
         self.module_style.pack(fill='x', padx=10, pady=(0, 10))
-        self.module_style.bind('<<ComboboxSelected>>', self.generate_qr)
+        self.module_style.bind('<<ComboboxSelected>>', self.on_module_style_change)
         
 
         color_frame = ttk.LabelFrame(parent, text="Color Options", style='Custom.TFrame')
@@ -207,6 +251,18 @@ class QRCodeGenerator:
                                          command=self.remove_logo, style='Custom.TButton')
         self.remove_logo_btn.pack(fill='x', padx=10, pady=(0, 10))
         
+        template_frame = ttk.LabelFrame(parent, text="Templates", style='Custom.TFrame')
+        template_frame.pack(fill='x', pady=(0, 10))
+        
+        self.template_choice = ttk.Combobox(template_frame, values=sorted(self.templates),
+                                            state='readonly', style='Custom.TCombobox')
+        self.template_choice.pack(fill='x', padx=10, pady=(10, 5))
+        self.template_choice.bind('<<ComboboxSelected>>', self.apply_template)
+        
+        self.save_template_btn = ttk.Button(template_frame, text="📌 Save as Template",
+                                            command=self.save_template, style='Custom.TButton')
+        self.save_template_btn.pack(fill='x', padx=10, pady=(0, 10))
+        
 
         action_frame = ttk.Frame(parent, style='Custom.TFrame')
         action_frame.pack(fill='x', pady=(10, 0))
@@ -218,6 +274,24 @@ class QRCodeGenerator:
         self.save_btn = ttk.Button(action_frame, text="💾 Save QR Code", 
                                   command=self.save_qr, style='Custom.TButton')
         self.save_btn.pack(fill='x')
+        
+        self.autosave_var = tk.BooleanVar(value=self.autosave_history)
+        self.autosave_check = ttk.Checkbutton(action_frame, text="🕘 Autosave history",
+                                              variable=self.autosave_var,
+                                              command=self.toggle_autosave)
+        self.autosave_check.pack(anchor='w', pady=(5, 0))
+        
+        self.perf_var = tk.BooleanVar(value=self.show_perf_overlay)
+        self.perf_check = ttk.Checkbutton(action_frame, text="📊 Performance overlay (F2)",
+                                          variable=self.perf_var,
+                                          command=self.toggle_perf_overlay)
+        self.perf_check.pack(anchor='w', pady=(5, 0))
+    
+    def bind_shortcuts(self):
+        self.root.bind('<F2>', lambda e: self.toggle_perf_overlay(flip=True))
+        self.root.bind('<F3>', lambda e: self.request_profile('cprofile'))
+        self.root.bind('<F4>', lambda e: self.request_profile('tracemalloc'))
+        self.root.bind('<Control-e>', lambda e: self.export_metrics())
     
     def create_preview_panel(self, parent):
         """Create the preview panel"""
@@ -225,23 +299,85 @@ class QRCodeGenerator:
         preview_frame.pack(fill='both', expand=True, padx=10)
         
         self.canvas = tk.Canvas(preview_frame, bg='white', relief='flat')
-        self.canvas.pack(fill='both', expand=True, padx=20, pady=20)
+        self.canvas.pack(fill='both', expand=True, padx=20, pady=(20, 5))
         
-
-        self.root.after(100, self.generate_qr)
+        self.render_status = ttk.Label(preview_frame, text="", style='Custom.TLabel')
+        self.render_status.pack(pady=(0, 10))
+        
+        # The first <Configure> also triggers the initial render
+        self.canvas.bind('<Configure>', self.on_canvas_configure)
+    
+    def restore_last_render(self):
+        """Put the last session's inputs back and show its saved preview right away"""
+        if not self.remember_last_render or not self.last_render:
+            return
+        last = self.last_render
+        self.text_entry.delete('1.0', tk.END)
+        self.text_entry.insert('1.0', last.get('content', ''))
+        self.error_correction.set(last.get('error_level', "Medium (15%)"))
+        self.module_style.set(last.get('module_style', "Square"))
+        if last.get('logo_path') and os.path.exists(last['logo_path']):
+            self.logo_path = last['logo_path']
+            self.logo_info.config(text=f"Logo: {os.path.basename(self.logo_path)}")
+        try:
+            # Tk reads PNG itself, so this needs neither Pillow nor a render
+            self.cached_preview = tk.PhotoImage(file=LAST_PREVIEW_PATH)
+        except (tk.TclError, OSError):
+            self.cached_preview = None
+    
+    def save_last_render(self):
+        """Keep the current preview and its inputs for the next start-up"""
+        if not self.remember_last_render or self.preview_image is None:
+            return
+        try:
+            self.preview_image.save(LAST_PREVIEW_PATH)
+            fields = self.current_fields()
+            self.last_render = {key: fields[key] for key in
+                                ('content', 'error_level', 'module_style', 'logo_path')}
+        except Exception as e:
+            print(f"Error saving last preview: {e}")
+    
+    def on_canvas_configure(self, event=None):
+        if self.cached_preview is not None and event is not None:
+            self.canvas.delete("all")
+            self.canvas.create_image(event.width // 2, event.height // 2,
+                                     image=self.cached_preview, anchor="center")
+        if self._resize_timer is not None:
+            self.root.after_cancel(self._resize_timer)
+        self._resize_timer = self.root.after(RESIZE_DEBOUNCE_MS, self.on_canvas_resized)
+    
+    def on_canvas_resized(self):
+        self._resize_timer = None
+        if self.preview_max_size() != self._preview_size:
+            self.generate_qr()
     
     def on_text_change(self, event=None):
 
+        self.invalidate('encode')
         if hasattr(self, '_text_change_timer'):
             self.root.after_cancel(self._text_change_timer)
         self._text_change_timer = self.root.after(500, self.generate_qr)
     
+    def refresh_module_styles(self):
+        """List registered styles too; runs when the list opens, not at start-up"""
+        from qr_styles import style_names
+        self.module_style.config(values=style_names())
+    
+    def on_error_level_change(self, event=None):
+        self.invalidate('encode')
+        self.generate_qr()
+    
+    def on_module_style_change(self, event=None):
+        self.invalidate('draw')
+        self.generate_qr()
+    
     def choose_fg_color(self):
 
         color = colorchooser.askcolor(color=self.fg_color, title="Choose Foreground Color")
         if color[1]:
             self.fg_color = color[1]
             self.fg_color_btn.config(bg=self.fg_color)
+            self.invalidate('draw')
             self.generate_qr()
     
     def choose_bg_color(self):
@@ -250,6 +386,7 @@ class QRCodeGenerator:
         if color[1]:
             self.bg_color = color[1]
             self.bg_color_btn.config(bg=self.bg_color)
+            self.invalidate('draw')
             self.generate_qr()
     
     def upload_logo(self):
@@ -264,6 +401,7 @@ class QRCodeGenerator:
         
         if file_path:
             try:
+                from PIL import Image
   
                 with Image.open(file_path) as img:
                     img.verify()
@@ -271,126 +409,164 @@ class QRCodeGenerator:
                 self.logo_path = file_path
                 filename = os.path.basename(file_path)
                 self.logo_info.config(text=f"Logo: {filename}")
+                self.invalidate('logo')
                 self.generate_qr()
                 
             except Exception as e:
                 messagebox.showerror("Error", f"Invalid image file: {str(e)}")
     
+    def save_template(self):
+        """Store the current style under a name for ``qr_code_app.py template``"""
+        name = simpledialog.askstring("Save Template", "Template name:", parent=self.root)
+        if not name or not name.strip():
+            return
+        name = name.strip()
+        if name in self.templates and not messagebox.askyesno(
+                "Save Template", f"Replace the template \"{name}\"?"):
+            return
+        from qr_templates import TEMPLATE_FIELDS
+        fields = self.current_fields()
+        # The app has no logo size control, so logo_percent is left to the default
+        self.templates[name] = {field: fields[field] for field in TEMPLATE_FIELDS if field in fields}
+        self.template_choice.config(values=sorted(self.templates))
+        self.template_choice.set(name)
+        self.save_settings()
+    
+    def apply_template(self, event=None):
+        template = self.templates.get(self.template_choice.get())
+        if not template:
+            return
+        self.error_correction.set(template.get('error_level', "Medium (15%)"))
+        self.module_style.set(template.get('module_style', "Square"))
+        self.fg_color = template.get('fg_color', '#000000')
+        self.bg_color = template.get('bg_color', '#FFFFFF')
+        self.fg_color_btn.config(bg=self.fg_color)
+        self.bg_color_btn.config(bg=self.bg_color)
+        logo_path = template.get('logo_path')
+        if logo_path and os.path.exists(logo_path):
+            self.logo_path = logo_path
+            self.logo_info.config(text=f"Logo: {os.path.basename(logo_path)}")
+        else:
+            self.logo_path = None
+            self.logo_info.config(text="No logo selected")
+        self.invalidate('encode')
+        self.generate_qr()
+    
     def remove_logo(self):
 
         self.logo_path = None
         self.logo_info.config(text="No logo selected")
+        self.invalidate('logo')
         self.generate_qr()
     
+    def current_fields(self, box_size=10):
+        """Read the render settings from the widgets; Tk thread only"""
+        return dict(
+            content=self.text_entry.get('1.0', tk.END).strip(),
+            error_level=self.error_correction.get(),
+            module_style=self.module_style.get(),
+            fg_color=self.fg_color,
+            bg_color=self.bg_color,
+            logo_path=self.logo_path,
+            box_size=box_size,
+        )
+    
+    def current_options(self, box_size=10):
+        """Collect the render options from the current widget state"""
+        from qr_render import RenderOptions
+        return RenderOptions(**self.current_fields(box_size))
+    
     def generate_qr(self, event=None):
-
-        try:
-
-            content = self.text_entry.get('1.0', tk.END).strip()
-            if not content:
-                content = "Hello, World!"
-            
-
-            error_levels = {
-                "Low (7%)": qrcode.constants.ERROR_CORRECT_L,
-                "Medium (15%)": qrcode.constants.ERROR_CORRECT_M,
-                "Quartile (25%)": qrcode.constants.ERROR_CORRECT_Q,
-                "High (30%)": qrcode.constants.ERROR_CORRECT_H
-            }
-            
-
-            module_drawers = {
-                "Square": SquareModuleDrawer(),
-                "Rounded": RoundedModuleDrawer(),
-                "Circle": CircleModuleDrawer()
-            }
-            
-
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=error_levels.get(self.error_correction.get(), 
-                                                qrcode.constants.ERROR_CORRECT_M),
-                box_size=10,
-                border=4,
-            )
-            
-            qr.add_data(content)
-            qr.make(fit=True)
-            
-            module_drawer = module_drawers.get(self.module_style.get(), SquareModuleDrawer())
-            
-
-            def hex_to_rgb(hex_color):
-                hex_color = hex_color.lstrip('#')
-                return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-            
-            fg_rgb = hex_to_rgb(self.fg_color)
-            bg_rgb = hex_to_rgb(self.bg_color)
-            
-            color_mask = SolidFillColorMask(back_color=bg_rgb, front_color=fg_rgb)
-            
-            img = qr.make_image(
-                image_factory=StyledPilImage,
-                module_drawer=module_drawer,
-                color_mask=color_mask
-            )
-            img.save(f"QR-CODE{time.time()}.png")
-            
-
-            if self.logo_path and os.path.exists(self.logo_path):
-                img = self.add_logo_to_qr(img, self.logo_path)
-            
-            self.current_qr_image = img
-            self.display_qr_image(img)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate QR code: {str(e)}")
+        """Queue a preview render on the background thread"""
+        fields = self.current_fields()
+        max_size = self.preview_max_size()
+        if max_size is None:
+            # Not laid out yet; <Configure> will ask again
+            return
+        self._preview_size = max_size
+        job = lambda is_stale: self.build_preview(fields, max_size, is_stale)
+        if self._profile_mode:
+            mode = self._profile_mode
+            self._profile_generation = self.render_worker.submit(
+                lambda is_stale: profile_call(lambda: job(is_stale), mode))
+        else:
+            self.render_worker.submit(job)
+        self.render_status.config(text="⏳ Rendering...")
+        self.schedule_render_poll()
     
-    def add_logo_to_qr(self, qr_img, logo_path):
-
-        try:
-
-            logo = Image.open(logo_path)
-            
-            qr_width, qr_height = qr_img.size
-            logo_size = min(qr_width, qr_height) // 5
-            
-
-            logo = logo.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
-            
-            logo_bg = Image.new('RGBA', (logo_size + 20, logo_size + 20), self.bg_color)
-            
-            logo_pos = ((logo_bg.width - logo.width) // 2, (logo_bg.height - logo.height) // 2)
-            if logo.mode == 'RGBA':
-                logo_bg.paste(logo, logo_pos, logo)
+    def build_preview(self, fields, max_size, is_stale):
+        """Runs on the render thread: everything up to the Tk image conversion.
+
+        Renders straight at the largest whole box size that fits the canvas,
+        so no resampling is needed. Full resolution is only rendered on save.
+        The first call also pays for importing the render core.
+        """
+        from qr_render import RenderOptions, fit_box_size
+        options = RenderOptions(**fields)
+        matrix = self.pipeline.cache.encode(options)
+        box_size = fit_box_size(matrix.size, options.border, max_size)
+        img = self.pipeline.render(options._replace(box_size=box_size), is_stale)
+        return img, self.make_thumbnail(img, max_size), options
+    
+    def schedule_render_poll(self):
+        if self._render_poll is None:
+            self._render_poll = self.root.after(RENDER_POLL_MS, self.poll_render)
+    
+    def poll_render(self):
+        """Pick up finished renders on the Tk thread"""
+        self._render_poll = None
+        result = self.render_worker.poll()
+        if result is not None:
+            if result.error:
+                self.render_status.config(text="❌ Render failed")
+                messagebox.showerror("Error", f"Failed to generate QR code: {str(result.error)}")
             else:
-                logo_bg.paste(logo, logo_pos)
-
-            qr_img = qr_img.convert('RGBA')
-            logo_pos_qr = ((qr_width - logo_bg.width) // 2, (qr_height - logo_bg.height) // 2)
-            qr_img.paste(logo_bg, logo_pos_qr, logo_bg)
-            
-            return qr_img.convert('RGB')
-            
-        except Exception as e:
-            print(f"Error adding logo: {e}")
-            return qr_img
+                value = result.value
+                if result.generation == self._profile_generation:
+                    value, report = value
+                    self._profile_mode = self._profile_generation = None
+                    self.save_profile_report(report)
+                metrics.record('preview_total', result.elapsed)
+                self.current_qr_image, preview, options = value
+                self.display_qr_image(preview)
+                if self.history:
+                    # Deduplicated on the options, not the pixels, which change with the preview size
+                    self.history.submit(self.current_qr_image, options)
+                self.render_status.config(text=f"✅ Rendered in {result.elapsed * 1000:.0f} ms")
+        
+        if self.render_worker.busy:
+            self.schedule_render_poll()
     
-    def display_qr_image(self, img):
+    def preview_max_size(self):
         canvas_width = self.canvas.winfo_width()
         canvas_height = self.canvas.winfo_height()
-        
         if canvas_width <= 1 or canvas_height <= 1:
-            self.root.after(100, lambda: self.display_qr_image(img))
-            return
-        
-        img_width, img_height = img.size
-        max_size = min(canvas_width - 40, canvas_height - 40, 400)
+            return None
+        return min(canvas_width - 40, canvas_height - 40, 400)
+    
+    @staticmethod
+    def make_thumbnail(img, max_size):
+        from PIL import Image
+        if max_size and (img.width > max_size or img.height > max_size):
+            # Rendered images are shared with the render cache
+            with metrics.timer('thumbnail'):
+                img = img.copy()
+                img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        return img
+    
+    def display_qr_image(self, img):
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
         
-        if img_width > max_size or img_height > max_size:
-            img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        # Only codes too large for the canvas even at one pixel per module
+        # still need scaling down
+        img = self.make_thumbnail(img, self.preview_max_size())
 
-        self.qr_photo = ImageTk.PhotoImage(img)
+        from PIL import ImageTk
+        with metrics.timer('photoimage'):
+            self.qr_photo = ImageTk.PhotoImage(img)
+        self.preview_image = img
+        self.cached_preview = None
         
         self.canvas.delete("all")
         canvas_center_x = canvas_width // 2
@@ -398,6 +574,85 @@ class QRCodeGenerator:
         
         self.canvas.create_image(canvas_center_x, canvas_center_y, 
                                image=self.qr_photo, anchor="center")
+        self.draw_perf_overlay()
+    
+    def toggle_perf_overlay(self, flip=False):
+        if flip:
+            self.perf_var.set(not self.perf_var.get())
+        self.show_perf_overlay = self.perf_var.get()
+        self.draw_perf_overlay()
+    
+    def draw_perf_overlay(self):
+        """Draw rolling per-stage timings over the top-left of the preview"""
+        self.canvas.delete('perf')
+        if not self.show_perf_overlay:
+            return
+        
+        snapshot = metrics.snapshot()
+        lines = [f"{'stage':<15}{'p50':>8}{'p95':>8}{'n':>6}"]
+        for stage in OVERLAY_STAGES:
+            stats = snapshot.get(stage)
+            if stats and 'p50_ms' in stats:
+                lines.append(f"{stage:<15}{stats['p50_ms']:>8.1f}{stats['p95_ms']:>8.1f}{stats['count']:>6}")
+        caches = self.cache_stats()
+        if caches:
+            lines.append(f"{'cache':<15}{'hits':>8}{'misses':>8}{'n':>6}")
+            for tier, stats in caches.items():
+                lines.append(f"{tier:<15}{stats['hits']:>8}{stats['misses']:>8}{stats['entries']:>6}")
+        lines.append("ms · Ctrl+E export · F3 profile · F4 memory")
+        
+        theme = self.dark_theme if self.is_dark_theme else self.light_theme
+        text_id = self.canvas.create_text(12, 12, text="\n".join(lines), anchor='nw',
+                                          font=('Consolas', 9), fill=theme['fg'], tags='perf')
+        x1, y1, x2, y2 = self.canvas.bbox(text_id)
+        rect_id = self.canvas.create_rectangle(x1 - 6, y1 - 4, x2 + 6, y2 + 4,
+                                               fill=theme['frame_bg'], outline=theme['accent'],
+                                               tags='perf')
+        self.canvas.tag_lower(rect_id, text_id)
+    
+    def cache_stats(self):
+        """Counters of the render cache's tiers, or None before the first render"""
+        return self._pipeline.cache.stats() if self._pipeline is not None else None
+    
+    def export_metrics(self):
+        file_path = filedialog.asksaveasfilename(
+            title="Export Performance Metrics",
+            defaultextension=".json",
+            filetypes=[
+                ("JSON files", "*.json"),
+                ("CSV files", "*.csv")
+            ]
+        )
+        
+        if file_path:
+            try:
+                if file_path.lower().endswith('.csv'):
+                    metrics.export_csv(file_path, self.cache_stats())
+                else:
+                    metrics.export_json(file_path, self.cache_stats())
+                messagebox.showinfo("Success", f"Metrics exported successfully!\n{file_path}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to export metrics: {str(e)}")
+    
+    def request_profile(self, mode):
+        """Capture a cProfile or tracemalloc report for the next render"""
+        self._profile_mode = mode
+        self.render_status.config(text=f"🔬 Profiling next render ({mode})...")
+        self.generate_qr()
+    
+    def save_profile_report(self, report):
+        file_path = filedialog.asksaveasfilename(
+            title="Save Profile Report",
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt")]
+        )
+        
+        if file_path:
+            try:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    f.write(report)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save profile report: {str(e)}")
     
     def save_qr(self):
         if not self.current_qr_image:
@@ -410,69 +665,61 @@ class QRCodeGenerator:
             filetypes=[
                 ("PNG files", "*.png"),
                 ("JPEG files", "*.jpg"),
+                ("TIFF files", "*.tif"),
+                ("SVG files", "*.svg"),
+                ("PDF files", "*.pdf"),
                 ("All files", "*.*")
             ]
         )
         
         if file_path:
             try:
-                high_res_qr = self.generate_high_res_qr()
-                high_res_qr.save(file_path)
+                from qr_output import DEFAULT_OUTPUT_PROFILE, OUTPUT_PROFILES, save_image
+                from qr_vector import VECTOR_FORMATS
+                profile = (self.output_profile if self.output_profile in OUTPUT_PROFILES
+                           else DEFAULT_OUTPUT_PROFILE)
+                ext = os.path.splitext(file_path)[1].lower().lstrip('.')
+                if ext in VECTOR_FORMATS:
+                    self.export_vector(file_path)
+                else:
+                    with metrics.timer('high_res_total'):
+                        if ext in ('tif', 'tiff'):
+                            from qr_strips import save_strips
+                            options = self.current_options(box_size=20)
+                            size, seconds = save_strips(options, file_path, profile=profile,
+                                                        matrix=self.pipeline.cache.encode(options))
+                        else:
+                            high_res_qr = self.generate_high_res_qr()
+                            size, seconds = save_image(high_res_qr, file_path, profile=profile,
+                                                       has_logo=bool(self.logo_path))
+                    messagebox.showinfo("Success", f"QR code saved successfully!\n{file_path}\n"
+                                        f"{size / 1024:.1f} KB, encoded in {seconds * 1000:.0f} ms")
+                    return
                 messagebox.showinfo("Success", f"QR code saved successfully!\n{file_path}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save QR code: {str(e)}")
     
     def generate_high_res_qr(self):
-        content = self.text_entry.get('1.0', tk.END).strip()
-        if not content:
-            content = "Hello, World!"
-        
-        error_levels = {
-            "Low (7%)": qrcode.constants.ERROR_CORRECT_L,
-            "Medium (15%)": qrcode.constants.ERROR_CORRECT_M,
-            "Quartile (25%)": qrcode.constants.ERROR_CORRECT_Q,
-            "High (30%)": qrcode.constants.ERROR_CORRECT_H
-        }
-        
-        module_drawers = {
-            "Square": SquareModuleDrawer(),
-            "Rounded": RoundedModuleDrawer(),
-            "Circle": CircleModuleDrawer()
-        }
-        
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=error_levels.get(self.error_correction.get(), 
-                                            qrcode.constants.ERROR_CORRECT_M),
-            box_size=20,  
-            border=4,
-        )
-        
-        qr.add_data(content)
-        qr.make(fit=True)
-        
-        module_drawer = module_drawers.get(self.module_style.get(), SquareModuleDrawer())
-        
-
-        def hex_to_rgb(hex_color):
-            hex_color = hex_color.lstrip('#')
-            return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-        
-        fg_rgb = hex_to_rgb(self.fg_color)
-        bg_rgb = hex_to_rgb(self.bg_color)
-        
-        color_mask = SolidFillColorMask(back_color=bg_rgb, front_color=fg_rgb)
-        
-        img = qr.make_image(
-            image_factory=StyledPilImage,
-            module_drawer=module_drawer,
-            color_mask=color_mask
-        )
-        
-        if self.logo_path and os.path.exists(self.logo_path):
-            img = self.add_logo_to_qr(img, self.logo_path)
-        
-        return img
+        return self.pipeline.cache.render(self.current_options(box_size=20))
+    
+    def export_vector(self, file_path):
+        """Write the current code as SVG or PDF, straight from the module matrix"""
+        from qr_vector import save_vector
+        options = self.current_options(box_size=20)
+        save_vector(file_path, self.pipeline.cache.encode(options), options)
+    
+    def toggle_autosave(self):
+        self.autosave_history = self.autosave_var.get()
+        self.update_history()
+        self.save_settings()
+    
+    def update_history(self):
+        """Start or stop the autosave writer to match the setting"""
+        if self.autosave_history and not self.history:
+            self.history = AutosaveHistory(self.history_dir, self.history_limit)
+        elif not self.autosave_history and self.history:
+            self.history.close()
+            self.history = None
     
     def toggle_theme(self):
 
@@ -518,6 +765,13 @@ class QRCodeGenerator:
                     self.is_dark_theme = settings.get('dark_theme', False)
                     self.fg_color = settings.get('fg_color', '#000000')
                     self.bg_color = settings.get('bg_color', '#FFFFFF')
+                    self.autosave_history = settings.get('autosave_history', False)
+                    self.history_dir = settings.get('history_dir', DEFAULT_HISTORY_DIR)
+                    self.history_limit = settings.get('history_limit', DEFAULT_HISTORY_LIMIT)
+                    self.output_profile = settings.get('output_profile')
+                    self.remember_last_render = settings.get('remember_last_render', True)
+                    self.last_render = settings.get('last_render')
+                    self.templates = settings.get('templates') or {}
         except Exception:
             pass
     
@@ -526,19 +780,39 @@ class QRCodeGenerator:
             settings = {
                 'dark_theme': self.is_dark_theme,
                 'fg_color': self.fg_color,
-                'bg_color': self.bg_color
+                'bg_color': self.bg_color,
+                'autosave_history': self.autosave_history,
+                'history_dir': self.history_dir,
+                'history_limit': self.history_limit,
+                'output_profile': self.output_profile,
+                'remember_last_render': self.remember_last_render,
+                'last_render': self.last_render if self.remember_last_render else None,
+                'templates': self.templates
             }
             with open('qr_settings.json', 'w') as f:
                 json.dump(settings, f)
         except Exception:
             pass
 
+def serve(argv=None):
+    """Run the local HTTP render service (same as ``qr_code_app.py serve``)"""
+    from qr_cli import main as cli_main
+    return cli_main(['serve'] + list(sys.argv[1:] if argv is None else argv))
+
 def main():
+    if len(sys.argv) > 1:
+        from qr_cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
     root = tk.Tk()
     app = QRCodeGenerator(root)
     
     # Handle window closing
     def on_closing():
+        app.render_worker.stop()
+        if app.history:
+            app.history.close()
+        app.save_last_render()
         app.save_settings()
         root.destroy()
     
@@ -0,0 +1,91 @@
+"""Optional autosave history written off the UI thread"""
+import hashlib
+import json
+import os
+import queue
+import threading
+
+
+DEFAULT_HISTORY_DIR = 'qr_history'
+DEFAULT_HISTORY_LIMIT = 100
+HISTORY_PREFIX = 'QR-CODE-'
+
+
+class AutosaveHistory:
+    """Keeps a rolling, de-duplicated folder of recently rendered codes.
+
+    ``submit`` only enqueues the image. Hashing, PNG encoding and file
+    writes happen on a writer thread. Files are named after a hash of the
+    render options (see ``render_key``), or of the pixels when no options
+    are given, so rendering the same code twice, at any preview size, just
+    refreshes the existing file's timestamp. Once the folder holds more than ``limit`` files the
+    oldest ones are deleted. If the writer falls behind, new submissions
+    are dropped instead of piling up in memory.
+    """
+
+    def __init__(self, directory=DEFAULT_HISTORY_DIR, limit=DEFAULT_HISTORY_LIMIT, backlog=8):
+        self.directory = directory
+        self.limit = limit
+        self.written = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=backlog)
+        self._thread = threading.Thread(target=self._run, name='qr-history', daemon=True)
+        self._thread.start()
+
+    def submit(self, img, options=None):
+        try:
+            self._queue.put_nowait((img, options))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=2.0):
+        """Flush queued images and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def entries(self):
+        """History files, oldest first"""
+        try:
+            names = [name for name in os.listdir(self.directory)
+                     if name.startswith(HISTORY_PREFIX) and name.endswith('.png')]
+        except OSError:
+            return []
+        paths = [os.path.join(self.directory, name) for name in names]
+        return sorted(paths, key=os.path.getmtime)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except Exception as e:
+                print(f"Error saving history: {e}")
+
+    def _write(self, img, options=None):
+        digest = render_key(options) if options else hashlib.sha1(img.tobytes()).hexdigest()[:16]
+        path = os.path.join(self.directory, f"{HISTORY_PREFIX}{digest}.png")
+        if os.path.exists(path):
+            os.utime(path)
+            self.deduplicated += 1
+            return
+
+        from qr_output import save_image
+        os.makedirs(self.directory, exist_ok=True)
+        # History copies favour a quick write over the smallest file
+        save_image(img, path, 'png', 'fast')
+        self.written += 1
+
+        entries = self.entries()
+        for old in entries[:max(0, len(entries) - self.limit)]:
+            os.remove(old)
+
+
+def render_key(options):
+    """Hash of everything that decides how a code looks, except the box size it was drawn at"""
+    from qr_render import logo_fingerprint
+    fields = dict(options._asdict(), box_size=None, logo_path=logo_fingerprint(options.logo_path),
+                  fg_color=options.fg_color.lower(), bg_color=options.bg_color.lower())
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,166 @@
+"""Lightweight per-stage timing with rolling histograms and one-off profiling"""
+import functools
+import io
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+DEFAULT_WINDOW = 500
+
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Counters reported for each cache tier, as returned by LRUCache.stats
+CACHE_STAT_FIELDS = ('hits', 'misses', 'evictions', 'entries', 'bytes', 'max_bytes')
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class RollingHistogram:
+    """The most recent ``window`` samples of one stage, in seconds"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.total_count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.total_count += 1
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {'count': self.total_count}
+        buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        for seconds in ordered:
+            ms = seconds * 1000
+            index = next((i for i, bound in enumerate(BUCKET_BOUNDS_MS) if ms < bound),
+                         len(BUCKET_BOUNDS_MS))
+            buckets[index] += 1
+        return {
+            'count': self.total_count,
+            'window': len(ordered),
+            'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+            'p50_ms': round(_percentile(ordered, 0.5) * 1000, 3),
+            'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+            'max_ms': round(ordered[-1] * 1000, 3),
+            'last_ms': round(self.samples[-1] * 1000, 3),
+            'histogram': buckets,
+        }
+
+
+class Metrics:
+    """Thread-safe registry of rolling histograms keyed by stage name"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.enabled = True
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = RollingHistogram(self.window)
+            histogram.add(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def timed(self, stage):
+        """Decorator that records every call of the wrapped function under ``stage``"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: histogram.summary() for stage, histogram in self._stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def export_json(self, path, caches=None):
+        """Write the stage summaries, plus per-tier ``caches`` counters (see RenderCache.stats)"""
+        payload = {'bucket_bounds_ms': BUCKET_BOUNDS_MS, 'stages': self.snapshot()}
+        if caches:
+            payload['caches'] = caches
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+
+    def export_csv(self, path, caches=None):
+        """Write one row per stage, then a second table of ``caches`` counters if given"""
+        import csv
+        bucket_names = [f"lt_{bound}ms" for bound in BUCKET_BOUNDS_MS] + [f"ge_{BUCKET_BOUNDS_MS[-1]}ms"]
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms'] + bucket_names)
+            for stage, summary in sorted(self.snapshot().items()):
+                writer.writerow([stage] + [summary.get(key, '') for key in
+                                           ('count', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms')]
+                                + summary.get('histogram', [''] * len(bucket_names)))
+            if caches:
+                writer.writerow([])
+                writer.writerow(['cache'] + list(CACHE_STAT_FIELDS))
+                for tier, stats in caches.items():
+                    writer.writerow([tier] + [stats.get(key, '') for key in CACHE_STAT_FIELDS])
+
+
+# Shared by the render core and the GUI
+metrics = Metrics()
+
+
+def profile_call(func, mode='cprofile', limit=25):
+    """Run ``func()`` once under cProfile or tracemalloc.
+
+    Returns ``(result, report)``, where ``report`` is printable text.
+    tracemalloc only sees memory allocated through Python, so buffers Pillow
+    allocates internally do not show up in it. The profilers are imported
+    here rather than at the top, since the GUI loads this module at start-up.
+    """
+    if mode == 'tracemalloc':
+        import tracemalloc
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        try:
+            result = func()
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+        lines = [f"tracemalloc: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB", ""]
+        lines += [str(stat) for stat in after.compare_to(before, 'lineno')[:limit]]
+        return result, "\n".join(lines)
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    return result, out.getvalue()
@@ -0,0 +1,101 @@
+"""Raster output profiles: palette reduction and PNG/JPEG encoder settings"""
+import io
+import time
+import zlib
+
+from PIL import Image
+
+from qr_metrics import metrics
+
+
+OUTPUT_PROFILES = ('fast', 'balanced', 'smallest')
+DEFAULT_OUTPUT_PROFILE = 'balanced'
+
+PNG_SETTINGS = {
+    'fast': {'compress_level': 1},
+    'balanced': {'compress_level': 6},
+    'smallest': {'compress_level': 9},
+}
+
+# 1-bit rows of a two-colour code are long runs of identical bytes, which
+# run-length matching compresses nearly as well as a full search and faster
+TWO_COLOUR_PNG_SETTINGS = dict(PNG_SETTINGS, fast={'compress_level': 1, 'compress_type': zlib.Z_RLE})
+
+# No chroma subsampling, so module edges are not smeared into their neighbours
+JPEG_SETTINGS = {
+    'fast': {'quality': 90, 'subsampling': 0},
+    'balanced': {'quality': 95, 'subsampling': 0, 'optimize': True},
+    'smallest': {'quality': 90, 'subsampling': 0, 'optimize': True, 'progressive': True},
+}
+
+
+def two_colour_image(img, colors):
+    """Map an RGB image with at most two colours onto an exact 1-bit palette image"""
+    first = colors[0][1]
+    second = colors[-1][1]
+    band = next((i for i in range(3) if first[i] != second[i]), 0)
+    target = second[band]
+    index = img.getchannel(band).point(lambda v: 1 if v == target and first != second else 0)
+    paletted = Image.frombytes('P', img.size, index.tobytes())
+    paletted.putpalette(first + second)
+    return paletted
+
+
+def reduce_colours(img, profile=DEFAULT_OUTPUT_PROFILE, has_logo=False):
+    """Return the smallest lossless image mode for ``img`` that ``profile`` allows.
+
+    Two-colour codes become 1-bit palette images. Anti-aliased styles and
+    codes with a logo are palettised when they fit in 256 colours, except
+    with ``fast``. A logo rarely leaves a code with two colours, so ``fast``
+    does not scan for them when there is one.
+    """
+    if img.mode != 'RGB' or (has_logo and profile == 'fast'):
+        return img
+    colors = img.getcolors(256)
+    if colors is None:
+        return img
+    if len(colors) <= 2:
+        return two_colour_image(img, colors)
+    if profile == 'fast':
+        return img
+    paletted = img.quantize(len(colors), method=Image.Quantize.MAXCOVERAGE)
+    # quantize does not promise to keep every colour, so only use an exact result
+    if paletted.convert('RGB').tobytes() != img.tobytes():
+        return img
+    return paletted
+
+
+@metrics.timed('file_encode')
+def encode_image(img, fmt='png', profile=DEFAULT_OUTPUT_PROFILE, has_logo=False):
+    """Encode ``img`` as PNG or JPEG bytes using one of ``OUTPUT_PROFILES``.
+
+    Other formats Pillow knows by extension, such as BMP or WebP, are saved
+    with Pillow's defaults and the profile only applies to PNG and JPEG.
+    """
+    if profile not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile: {profile}")
+    out = io.BytesIO()
+    if fmt in ('jpg', 'jpeg'):
+        img.convert('RGB').save(out, 'JPEG', **JPEG_SETTINGS[profile])
+    elif fmt != 'png':
+        pil_format = Image.registered_extensions().get(f'.{fmt}')
+        if not pil_format:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        img.save(out, pil_format)
+    else:
+        img = reduce_colours(img, profile, has_logo)
+        settings = TWO_COLOUR_PNG_SETTINGS if img.mode == 'P' and len(img.getpalette()) <= 6 \
+            else PNG_SETTINGS
+        img.save(out, 'PNG', **settings[profile])
+    return out.getvalue()
+
+
+def save_image(img, path, fmt=None, profile=DEFAULT_OUTPUT_PROFILE, has_logo=False):
+    """Write ``img`` to ``path`` and return ``(bytes written, encode seconds)``"""
+    fmt = fmt or path.rsplit('.', 1)[-1].lower()
+    start = time.perf_counter()
+    data = encode_image(img, fmt, profile, has_logo)
+    elapsed = time.perf_counter() - start
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data), elapsed
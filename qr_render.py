@@ -0,0 +1,332 @@
+"""GUI-free QR code rendering core shared by the desktop app and headless modes"""
+import hashlib
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+import qrcode
+from qrcode.exceptions import DataOverflowError
+from PIL import Image
+
+from qr_metrics import metrics
+from qr_styles import get_style, style_names
+
+
+DEFAULT_CONTENT = "Hello, World!"
+
+ERROR_LEVELS = {
+    "Low (7%)": qrcode.constants.ERROR_CORRECT_L,
+    "Medium (15%)": qrcode.constants.ERROR_CORRECT_M,
+    "Quartile (25%)": qrcode.constants.ERROR_CORRECT_Q,
+    "High (30%)": qrcode.constants.ERROR_CORRECT_H
+}
+DEFAULT_ERROR_LEVEL = "Medium (15%)"
+
+# Short spellings accepted from manifests and the command line
+ERROR_LEVEL_ALIASES = {
+    "L": "Low (7%)",
+    "M": "Medium (15%)",
+    "Q": "Quartile (25%)",
+    "H": "High (30%)"
+}
+
+# Logo width as a percentage of the code's width
+DEFAULT_LOGO_PERCENT = 20
+
+# The built-in styles; see qr_styles.register_style for adding more
+MODULE_STYLES = style_names()
+DEFAULT_MODULE_STYLE = "Square"
+
+
+def hex_to_rgb(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def normalize_error_level(level):
+    """Map a label or short alias (L/M/Q/H) onto an ERROR_LEVELS label"""
+    if not level:
+        return DEFAULT_ERROR_LEVEL
+    level = ERROR_LEVEL_ALIASES.get(str(level).strip().upper(), level)
+    if level not in ERROR_LEVELS:
+        raise ValueError(f"Unknown error correction level: {level}")
+    return level
+
+
+def normalize_module_style(style):
+    if not style:
+        return DEFAULT_MODULE_STYLE
+    wanted = str(style).strip().lower()
+    for name in style_names():
+        if name.lower() == wanted:
+            return name
+    raise ValueError(f"Unknown module style: {style}")
+
+
+_RenderOptionsBase = namedtuple('_RenderOptionsBase', [
+    'content', 'error_level', 'module_style', 'fg_color', 'bg_color',
+    'logo_path', 'box_size', 'border', 'logo_percent'
+])
+
+
+class RenderOptions(_RenderOptionsBase):
+    """Everything that determines how a single QR code looks"""
+    __slots__ = ()
+
+    def __new__(cls, content=DEFAULT_CONTENT, error_level=DEFAULT_ERROR_LEVEL,
+                module_style=DEFAULT_MODULE_STYLE, fg_color="#000000", bg_color="#FFFFFF",
+                logo_path=None, box_size=10, border=4, logo_percent=DEFAULT_LOGO_PERCENT):
+        return super().__new__(cls, content or DEFAULT_CONTENT, error_level, module_style,
+                               fg_color, bg_color, logo_path or None, int(box_size), int(border),
+                               int(logo_percent))
+
+    @classmethod
+    def from_dict(cls, row, defaults=None, require_content=False):
+        """Build options from a manifest row, falling back to ``defaults`` for blank fields.
+
+        With ``require_content`` a row without its own content raises
+        ValueError instead of being drawn as the placeholder text.
+        """
+        if require_content and str(row.get('content') or '').strip() == '':
+            raise ValueError("Row has no 'content'")
+        merged = dict(defaults._asdict()) if defaults else {}
+        for key, value in row.items():
+            if key == 'logo':
+                key = 'logo_path'
+            if key in cls._fields and value not in (None, ""):
+                merged[key] = value
+        merged['error_level'] = normalize_error_level(merged.get('error_level'))
+        merged['module_style'] = normalize_module_style(merged.get('module_style'))
+        return cls(**merged)
+
+
+class QRMatrix:
+    """An encoded QR code: the module grid plus the version and mask chosen for it.
+
+    Modules are bit-packed, one bit per module with dark as 1, most
+    significant bit first and each row padded to a whole byte. That is the
+    layout of PBM files and Pillow's 1-bit images, and about 1/64 of the
+    memory of the list of lists of bools qrcode builds.
+
+    Drawing only needs this, never the QRCode that produced it.
+    """
+    __slots__ = ('bits', 'size', 'version', 'mask_pattern', 'error_correction')
+
+    def __init__(self, bits, size, version, mask_pattern, error_correction):
+        self.bits = bits
+        self.size = size
+        self.version = version
+        self.mask_pattern = mask_pattern
+        self.error_correction = error_correction
+
+    @classmethod
+    def from_modules(cls, modules, version, mask_pattern, error_correction):
+        """Pack a qrcode-style list of lists of bools"""
+        size = len(modules)
+        stride = (size + 7) // 8
+        bits = bytearray()
+        for row in modules:
+            value = 0
+            for cell in row:
+                value = value << 1 | bool(cell)
+            bits += (value << (stride * 8 - size)).to_bytes(stride, 'big')
+        return cls(bytes(bits), size, version, mask_pattern, error_correction)
+
+    @property
+    def stride(self):
+        """Bytes per packed row"""
+        return (self.size + 7) // 8
+
+    @property
+    def fit(self):
+        """The ``(version, mask_pattern)`` pair needed to re-encode without searching"""
+        return self.version, self.mask_pattern
+
+    def is_dark(self, row, col):
+        if not (0 <= row < self.size and 0 <= col < self.size):
+            return False
+        return bool(self.bits[row * self.stride + (col >> 3)] & (0x80 >> (col & 7)))
+
+    def row(self, row):
+        """One row as a list of bools"""
+        stride = self.stride
+        packed = self.bits[row * stride:(row + 1) * stride]
+        return [bool(packed[col >> 3] & (0x80 >> (col & 7))) for col in range(self.size)]
+
+    def unpack(self):
+        """The whole grid as a list of lists of bools, as qrcode holds it"""
+        return [self.row(row) for row in range(self.size)]
+
+    def to_image(self):
+        """Palette image with one pixel per module: index 1 for dark, 0 for light"""
+        return Image.frombytes('P', (self.size, self.size), self.bits, 'raw', 'P;1')
+
+    def to_pbm(self):
+        """Export just the matrix as a binary PBM, with no quiet zone or styling.
+
+        Several of these concatenated form a valid multi-image PBM stream.
+        """
+        level = next((alias for alias, label in ERROR_LEVEL_ALIASES.items()
+                      if ERROR_LEVELS[label] == self.error_correction), self.error_correction)
+        header = (f"P4\n# version {self.version} mask {self.mask_pattern} "
+                  f"ec {level}\n{self.size} {self.size}\n")
+        return header.encode('ascii') + self.bits
+
+
+@metrics.timed('encode')
+def encode(content, error_level=DEFAULT_ERROR_LEVEL, fit=None):
+    """Encode ``content`` into a QRMatrix.
+
+    Picking the version and the best of the eight mask patterns is most of
+    the cost of encoding. Passing the ``fit`` of an earlier encode of the
+    same data skips both searches.
+    """
+    error_correction = ERROR_LEVELS.get(error_level, qrcode.constants.ERROR_CORRECT_M)
+    if fit:
+        version, mask_pattern = fit
+        qr = qrcode.QRCode(version=version, error_correction=error_correction,
+                           mask_pattern=mask_pattern)
+        qr.add_data(content or DEFAULT_CONTENT)
+        qr.make(fit=False)
+    else:
+        qr = qrcode.QRCode(version=1, error_correction=error_correction)
+        qr.add_data(content or DEFAULT_CONTENT)
+        try:
+            qr.best_fit(start=qr.version)
+        except ValueError:
+            # Some qrcode releases trip over version 41 before raising their own error
+            raise DataOverflowError(f"Content is too long for a QR code at {error_level}")
+        mask_pattern = qr.best_mask_pattern()
+        qr.makeImpl(False, mask_pattern)
+    return QRMatrix.from_modules(qr.modules, qr.version, mask_pattern, error_correction)
+
+
+def fit_box_size(modules_count, border, max_pixels):
+    """Largest whole number of pixels per module that keeps the code within ``max_pixels``"""
+    return max(1, max_pixels // (modules_count + border * 2))
+
+
+@metrics.timed('draw')
+def make_qr_image(matrix, options):
+    """Draw a QRMatrix with the module style, colours and size from ``options``.
+
+    Styles come from the qr_styles registry; unknown names fall back to
+    square modules.
+    """
+    try:
+        style = get_style(options.module_style)
+    except ValueError:
+        style = get_style(DEFAULT_MODULE_STYLE)
+    return style.render(matrix, options.box_size, options.border,
+                        hex_to_rgb(options.fg_color), hex_to_rgb(options.bg_color))
+
+
+_logo_digests = {}
+
+
+def logo_fingerprint(logo_path):
+    """Return ``(sha1, mtime_ns)`` for a logo file, or None if there is no usable logo.
+
+    Digests are remembered per path and only recomputed when the file's
+    size or modification time changes.
+    """
+    if not logo_path:
+        return None
+    try:
+        stat = os.stat(logo_path)
+    except OSError:
+        return None
+    cached = _logo_digests.get(logo_path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2], stat.st_mtime_ns
+    with open(logo_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    _logo_digests[logo_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest, stat.st_mtime_ns
+
+
+def require_logo(logo_path):
+    """Like ``logo_fingerprint``, but a ``logo_path`` that names no file raises FileNotFoundError"""
+    fingerprint = logo_fingerprint(logo_path)
+    if fingerprint is None and logo_path:
+        raise FileNotFoundError(f"Logo not found: {logo_path}")
+    return fingerprint
+
+
+@lru_cache(maxsize=8)
+def load_logo(logo_path, fingerprint):
+    """Decode a logo once per file version"""
+    logo = Image.open(logo_path)
+    logo.load()
+    return logo
+
+
+@lru_cache(maxsize=32)
+def logo_overlay(logo_path, fingerprint, logo_size, bg_color):
+    """Build the padded logo tile for one code size and background colour.
+
+    Returns the tile as RGB plus the alpha mask to paste it with, or None
+    for the mask when the tile is fully opaque.
+    """
+    logo = load_logo(logo_path, fingerprint)
+
+    logo = logo.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
+
+    logo_bg = Image.new('RGBA', (logo_size + 20, logo_size + 20), bg_color)
+
+    logo_pos = ((logo_bg.width - logo.width) // 2, (logo_bg.height - logo.height) // 2)
+    if logo.mode == 'RGBA':
+        logo_bg.paste(logo, logo_pos, logo)
+    else:
+        logo_bg.paste(logo, logo_pos)
+
+    alpha = logo_bg.getchannel('A')
+    mask = None if alpha.getextrema() == (255, 255) else alpha
+    return logo_bg.convert('RGB'), mask
+
+
+@metrics.timed('logo')
+def add_logo_to_qr(qr_img, logo_path, bg_color, in_place=False, percent=DEFAULT_LOGO_PERCENT,
+                   strict=False):
+    """Paste the logo on a padded background square in the centre of the code.
+
+    The overlay comes from a cache, so this only touches the centre of
+    ``qr_img``. The result is a copy unless ``in_place`` is set. A logo
+    that is missing or cannot be decoded is reported and left out, or
+    raises when ``strict`` is set.
+    """
+    try:
+        fingerprint = require_logo(logo_path)
+
+        qr_width, qr_height = qr_img.size
+        logo_size = min(qr_width, qr_height) * percent // 100
+        overlay, mask = logo_overlay(logo_path, fingerprint, logo_size, bg_color)
+
+        if qr_img.mode != 'RGB':
+            qr_img = qr_img.convert('RGB')
+        elif not in_place:
+            qr_img = qr_img.copy()
+        logo_pos_qr = ((qr_width - overlay.width) // 2, (qr_height - overlay.height) // 2)
+        qr_img.paste(overlay, logo_pos_qr, mask)
+
+        return qr_img
+
+    except Exception as e:
+        if strict:
+            raise
+        print(f"Error adding logo: {e}")
+        return qr_img
+
+
+def draw_qr(matrix, options):
+    """Draw a QRMatrix and overlay the logo if there is one; a bad logo raises"""
+    img = make_qr_image(matrix, options)
+    if options.logo_path:
+        img = add_logo_to_qr(img, options.logo_path, options.bg_color, in_place=True,
+                             percent=options.logo_percent, strict=True)
+    return img
+
+
+def render_qr(options):
+    """Run the whole pipeline: encode, draw, then overlay the logo if there is one"""
+    return draw_qr(encode(options.content, options.error_level), options)
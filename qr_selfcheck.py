@@ -0,0 +1,130 @@
+"""Pixel-identity checks of the fast renderers against qrcode's StyledPilImage pipeline"""
+import itertools
+import os
+import tempfile
+
+from PIL import Image
+import qrcode
+from qrcode.image.styledpil import StyledPilImage
+from qrcode.image.styles.colormasks import SolidFillColorMask
+from qrcode.image.styles.moduledrawers import (CircleModuleDrawer, RoundedModuleDrawer,
+                                               SquareModuleDrawer)
+
+from qr_bench import make_bench_logo
+from qr_render import ERROR_LEVELS, RenderOptions, add_logo_to_qr, encode, hex_to_rgb, render_qr
+from qr_strips import iter_bands, save_strips
+
+
+CONTENTS = ("hi", "https://example.com/some/path?query=" + "x" * 80)
+COLOUR_PAIRS = (("#000000", "#FFFFFF"), ("#123456", "#fafafa"), ("#ffffff", "#000000"),
+                ("#ff0000", "#00ff00"))
+BOX_SIZES = (3, 8, 11)
+BORDERS = (0, 4)
+
+# One pixel row, a few module rows, and the whole code in one band
+BAND_BYTES = (1, 20000, 10 ** 9)
+
+# The qrcode drawers each built-in style has to match
+REFERENCE_DRAWERS = {
+    "Square": SquareModuleDrawer,
+    "Rounded": RoundedModuleDrawer,
+    "Circle": CircleModuleDrawer,
+}
+
+
+def reference_image(options):
+    """Draw ``options`` the way the app did before the fast renderers, with StyledPilImage"""
+    qr = qrcode.QRCode(version=1, error_correction=ERROR_LEVELS[options.error_level],
+                       box_size=options.box_size, border=options.border)
+    qr.add_data(options.content)
+    qr.make(fit=True)
+    color_mask = SolidFillColorMask(back_color=hex_to_rgb(options.bg_color),
+                                    front_color=hex_to_rgb(options.fg_color))
+    img = qr.make_image(image_factory=StyledPilImage,
+                        module_drawer=REFERENCE_DRAWERS[options.module_style](),
+                        color_mask=color_mask).get_image()
+    if options.logo_path:
+        img = add_logo_to_qr(img, options.logo_path, options.bg_color, percent=options.logo_percent)
+    return img
+
+
+def make_logos(directory):
+    """An RGBA PNG logo and an opaque JPEG copy, which take different paste paths"""
+    png_path = make_bench_logo(directory)
+    jpg_path = os.path.join(directory, 'bench_logo.jpg')
+    with Image.open(png_path) as logo:
+        logo.convert('RGB').save(jpg_path, quality=90)
+    return (None, png_path, jpg_path)
+
+
+def same_pixels(a, b):
+    return a.size == b.size and a.convert('RGB').tobytes() == b.convert('RGB').tobytes()
+
+
+def check_styles(logos=(None,)):
+    """Compare ``render_qr`` with ``reference_image``, returning ``(cases, mismatches)``"""
+    cases = []
+    mismatches = []
+    for content, style, (fg, bg), box_size, border, logo in itertools.product(
+            CONTENTS, REFERENCE_DRAWERS, COLOUR_PAIRS, BOX_SIZES, BORDERS, logos):
+        options = RenderOptions(content=content, module_style=style, fg_color=fg, bg_color=bg,
+                                box_size=box_size, border=border, logo_path=logo)
+        cases.append(options)
+        if not same_pixels(render_qr(options), reference_image(options)):
+            mismatches.append(options)
+    return cases, mismatches
+
+
+def check_bands(logos=(None,), directory=None):
+    """Compare stacked ``iter_bands`` output, and PNG/TIFF files written from it, with ``render_qr``.
+
+    Files are only written, to ``directory``, for the middle band size.
+    Returns ``(cases, mismatches)``; mismatches are ``(options, what)`` pairs.
+    """
+    cases = []
+    mismatches = []
+    for content, style, (fg, bg), box_size, logo in itertools.product(
+            CONTENTS, REFERENCE_DRAWERS, COLOUR_PAIRS[:3], BOX_SIZES[::2], logos):
+        options = RenderOptions(content=content, module_style=style, fg_color=fg, bg_color=bg,
+                                box_size=box_size, logo_path=logo)
+        expected = render_qr(options)
+        matrix = encode(options.content, options.error_level)
+        for band_bytes in BAND_BYTES:
+            cases.append(options)
+            stacked = Image.new('RGB', expected.size)
+            y = 0
+            for band in iter_bands(matrix, options, band_bytes):
+                stacked.paste(band.convert('RGB'), (0, y))
+                y += band.height
+            if y != expected.height or not same_pixels(stacked, expected):
+                mismatches.append((options, f"bands of {band_bytes} bytes"))
+        if directory:
+            for fmt in ('png', 'tif'):
+                path = os.path.join(directory, f"strips.{fmt}")
+                save_strips(options, path, fmt, band_bytes=BAND_BYTES[1], matrix=matrix)
+                with Image.open(path) as written:
+                    if not same_pixels(written, expected):
+                        mismatches.append((options, f"{fmt.upper()} file"))
+    return cases, mismatches
+
+
+def describe_case(options):
+    return (f"{options.module_style} {options.fg_color}/{options.bg_color} box {options.box_size} "
+            f"border {options.border} content {len(options.content)} chars "
+            f"logo {os.path.basename(options.logo_path) if options.logo_path else 'none'}")
+
+
+def run_cli(args):
+    """Handle ``selfcheck`` on the command line"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logos = make_logos(tmp)
+        cases, mismatches = check_styles(logos)
+        for options in mismatches:
+            print(f"MISMATCH styles: {describe_case(options)}")
+        print(f"Styles: {len(cases)} cases, {len(mismatches)} mismatches")
+
+        band_cases, band_mismatches = check_bands(logos[:2], tmp)
+        for options, what in band_mismatches:
+            print(f"MISMATCH {what}: {describe_case(options)}")
+        print(f"Bands: {len(band_cases)} cases, {len(band_mismatches)} mismatches")
+    return 1 if mismatches or band_mismatches else 0
@@ -0,0 +1,352 @@
+"""Local HTTP render service backed by a warm process pool and response caches"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from qrcode.exceptions import DataOverflowError
+
+from qr_batch import render_bytes
+from qr_cache import LRUCache, RenderCache, RenderPipeline
+from qr_output import DEFAULT_OUTPUT_PROFILE
+from qr_render import RenderOptions, logo_fingerprint
+
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+    'pbm': 'image/x-portable-bitmap',
+}
+MAX_BOX_SIZE = 50
+MAX_BORDER = 16
+MAX_LOGO_PERCENT = 40
+MAX_CONTENT_LENGTH = 4096
+DEFAULT_MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_CACHE_BYTES = 512 * 1024 * 1024
+LOGO_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')
+
+_pipeline = None
+
+
+def get_pipeline():
+    """Per-worker pipeline; unlike batch it keeps finished images, since requests repeat"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = RenderPipeline(RenderCache(image_bytes=16 * 1024 * 1024, strict_logo=True))
+    return _pipeline
+
+
+def worker_cache_stats():
+    """This worker's process id and render cache counters"""
+    return os.getpid(), get_pipeline().cache.stats()
+
+
+def render_file(options, fmt, profile=DEFAULT_OUTPUT_PROFILE):
+    """Worker entry point: render one code.
+
+    Returns the encoded file bytes together with ``worker_cache_stats``,
+    which is how the service keeps track of caches in other processes.
+    """
+    return render_bytes(options, fmt, get_pipeline(), profile), worker_cache_stats()
+
+
+def _warm_worker():
+    """Pay import and first-render costs before the first request arrives"""
+    render_file(RenderOptions("warm-up"), 'png')
+
+
+class RequestError(Exception):
+    """A client mistake, reported as 400 Bad Request"""
+
+
+class QRRenderService:
+    """Turns request parameters into cached, content-addressed QR code responses.
+
+    Responses are kept in a memory LRU and, with a ``cache_dir``, as files
+    named after their ETag. Once the files add up to more than
+    ``disk_cache_bytes`` the least recently used ones are deleted, by
+    modification time, which every disk hit refreshes.
+    """
+
+    def __init__(self, workers=None, logo_dir=None, cache_dir=None,
+                 memory_cache_bytes=DEFAULT_MEMORY_CACHE_BYTES,
+                 disk_cache_bytes=DEFAULT_DISK_CACHE_BYTES, profile=DEFAULT_OUTPUT_PROFILE):
+        self.workers = workers or os.cpu_count() or 1
+        self.profile = profile
+        self.logo_dir = logo_dir
+        self.cache_dir = cache_dir
+        self.memory = LRUCache(memory_cache_bytes, len)
+        self.disk_cache_bytes = disk_cache_bytes
+        self.disk_bytes = 0
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self.renders = 0
+        self.worker_caches = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Counts what earlier runs left behind, trimming it if the cap has shrunk
+            self.prune_disk()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # Start every worker now instead of on the first requests
+        for future in [self.pool.submit(worker_cache_stats) for _ in range(self.workers)]:
+            self.record_worker(*future.result())
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def resolve_logo(self, logo_id):
+        """Map a logo id onto a file in ``logo_dir``; ids never name arbitrary paths"""
+        if not logo_id:
+            return None
+        if not self.logo_dir or os.path.basename(logo_id) != logo_id:
+            raise RequestError(f"Unknown logo: {logo_id}")
+        for name in os.listdir(self.logo_dir):
+            stem, ext = os.path.splitext(name)
+            if (stem == logo_id or name == logo_id) and ext.lower() in LOGO_EXTENSIONS:
+                return os.path.join(self.logo_dir, name)
+        raise RequestError(f"Unknown logo: {logo_id}")
+
+    def parse(self, params):
+        """Validate request parameters into ``(options, fmt)``"""
+        get = lambda *names: next((params[n] for n in names if params.get(n) not in (None, "")), None)
+        content = get('content', 'data')
+        if not content:
+            raise RequestError("Missing 'content'")
+        if len(content) > MAX_CONTENT_LENGTH:
+            raise RequestError("Content is too long")
+        fmt = (get('format') or 'png').lower().replace('jpeg', 'jpg')
+        if fmt not in CONTENT_TYPES:
+            raise RequestError(f"Unsupported format: {fmt}")
+        try:
+            box_size = int(get('size', 'box_size') or 10)
+            options = RenderOptions.from_dict({
+                'content': content,
+                'error_level': get('error_level', 'ec'),
+                'module_style': get('module_style', 'style'),
+                'fg_color': get('fg_color', 'fg'),
+                'bg_color': get('bg_color', 'bg'),
+                'box_size': box_size,
+                'border': get('border'),
+                'logo_percent': get('logo_percent'),
+            })
+        except ValueError as e:
+            raise RequestError(str(e))
+        if not 1 <= options.box_size <= MAX_BOX_SIZE:
+            raise RequestError(f"'size' must be between 1 and {MAX_BOX_SIZE}")
+        if not 0 <= options.border <= MAX_BORDER:
+            raise RequestError(f"'border' must be between 0 and {MAX_BORDER}")
+        if not 1 <= options.logo_percent <= MAX_LOGO_PERCENT:
+            raise RequestError(f"'logo_percent' must be between 1 and {MAX_LOGO_PERCENT}")
+        for color in (options.fg_color, options.bg_color):
+            if len(color.lstrip('#')) != 6 or any(c not in '0123456789abcdefABCDEF' for c in color.lstrip('#')):
+                raise RequestError(f"Invalid colour: {color}")
+        return options._replace(logo_path=self.resolve_logo(get('logo', 'logo_id'))), fmt
+
+    def etag(self, options, fmt):
+        """Content hash of everything that determines the response bytes"""
+        fields = dict(options._asdict(), logo_path=logo_fingerprint(options.logo_path),
+                      fg_color=options.fg_color.lower(), bg_color=options.bg_color.lower(),
+                      format=fmt, profile=self.profile)
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+    def get(self, options, fmt, etag):
+        """Return response bytes from memory, disk or a fresh render"""
+        body = self.memory.get(etag)
+        if body is not None:
+            return body
+
+        disk_path = os.path.join(self.cache_dir, f"{etag}.{fmt}") if self.cache_dir else None
+        body = self.read_disk(disk_path) if disk_path else None
+        if body is not None:
+            self.disk_hits += 1
+            self.memory.put(etag, body)
+            return body
+
+        # Concurrent requests for the same code share one render
+        with self._lock:
+            future = self._inflight.get(etag)
+            owner = future is None
+            if owner:
+                future = self._inflight[etag] = self.pool.submit(render_file, options, fmt,
+                                                                      self.profile)
+        try:
+            body, (pid, caches) = future.result()
+        finally:
+            if owner:
+                with self._lock:
+                    self._inflight.pop(etag, None)
+        if owner:
+            self.renders += 1
+            self.record_worker(pid, caches)
+            self.memory.put(etag, body)
+            if disk_path:
+                self.write_disk(disk_path, body)
+        return body
+
+    def record_worker(self, pid, caches):
+        """Keep the latest render cache counters a worker reported"""
+        with self._lock:
+            self.worker_caches[pid] = caches
+
+    @staticmethod
+    def read_disk(disk_path):
+        """Bytes of a cached file, or None; reading it marks it recently used"""
+        try:
+            with open(disk_path, 'rb') as f:
+                body = f.read()
+            os.utime(disk_path)
+        except FileNotFoundError:
+            # Never cached, or pruned since
+            return None
+        return body
+
+    def write_disk(self, disk_path, body):
+        tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, disk_path)
+        with self._disk_lock:
+            self.disk_bytes += len(body)
+        if self.disk_bytes > self.disk_cache_bytes:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Delete the least recently used files until the cache is at 90% of its cap.
+
+        Pruning lists the whole directory, so it frees some headroom rather
+        than running again on the very next write.
+        """
+        with self._disk_lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+            entries.sort()
+            total = sum(size for _, _, size in entries)
+            if total > self.disk_cache_bytes:
+                target = self.disk_cache_bytes * 9 // 10
+                for _, path, size in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    self.disk_evictions += 1
+            self.disk_bytes = total
+
+    def stats(self):
+        disk = {'hits': self.disk_hits, 'evictions': self.disk_evictions,
+                'bytes': self.disk_bytes, 'max_bytes': self.disk_cache_bytes} if self.cache_dir else None
+        with self._lock:
+            # Each worker's counters as of its latest render
+            render_caches = {str(pid): caches for pid, caches in self.worker_caches.items()}
+        return {'workers': self.workers, 'renders': self.renders, 'memory': self.memory.stats(),
+                'disk': disk, 'render_caches': render_caches}
+
+
+class QRRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'QRCodeGenerator'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            return self.send_json(200, self.server.service.stats())
+        if url.path != '/qr':
+            return self.send_json(404, {'error': 'Not found'})
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.handle_render(params)
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/qr':
+            return self.send_json(404, {'error': 'Not found'})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            params = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError("Expected a JSON object")
+        except ValueError as e:
+            return self.send_json(400, {'error': f"Invalid JSON body: {e}"})
+        self.handle_render({key: str(value) for key, value in params.items() if value is not None})
+
+    def handle_render(self, params):
+        service = self.server.service
+        try:
+            options, fmt = service.parse(params)
+            etag = service.etag(options, fmt)
+            quoted = f'"{etag}"'
+            if quoted in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(304)
+                self.send_header('ETag', quoted)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = service.get(options, fmt, etag)
+        except (RequestError, DataOverflowError) as e:
+            return self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            return self.send_json(500, {'error': f"Failed to generate QR code: {e}"})
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES[fmt])
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', quoted)
+        if options.logo_path:
+            # The logo file can be replaced, so clients revalidate against the ETag
+            self.send_header('Cache-Control', 'public, no-cache')
+        else:
+            # Without a logo the URL fully determines the bytes, so responses never go stale
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(service, host='127.0.0.1', port=8765, quiet=False):
+    server = ThreadingHTTPServer((host, port), QRRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def run_cli(args):
+    """Handle ``serve`` on the command line"""
+    service = QRRenderService(workers=args.workers, logo_dir=args.logo_dir,
+                              cache_dir=args.cache_dir or None,
+                              memory_cache_bytes=args.memory_cache_mb * 1024 * 1024,
+                              disk_cache_bytes=args.disk_cache_mb * 1024 * 1024,
+                              profile=args.profile)
+    server = make_server(service, args.host, args.port, quiet=args.quiet)
+    print(f"Serving QR codes on http://{args.host}:{server.server_address[1]}/qr "
+          f"with {service.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
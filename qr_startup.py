@@ -0,0 +1,106 @@
+"""Start-up time tracking for the GUI module, based on ``python -X importtime``"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+STARTUP_MODULE = 'qr_code_app'
+DEFAULT_RUNS = 7
+DEFAULT_TARGET_MS = 60.0
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_TOP = 10
+
+# Loaded on first render, never while the window is opening
+DEFERRED_MODULES = ('PIL', 'qrcode', 'qr_render', 'qr_cache', 'qr_output', 'qr_vector')
+
+
+def parse_importtime(stderr):
+    """Return ``{module: (self_us, cumulative_us)}`` from ``-X importtime`` output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the column header
+        times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+def measure_once(module=STARTUP_MODULE):
+    """Import ``module`` in a fresh interpreter and return its import times and wall time"""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr), wall
+
+
+def measure(module=STARTUP_MODULE, runs=DEFAULT_RUNS, top=DEFAULT_TOP):
+    """Median import and process times over ``runs`` cold interpreters.
+
+    The first run only warms the bytecode and OS file caches and is not
+    counted. ``slowest`` lists the modules with the largest median self time.
+    """
+    measure_once(module)
+    samples = [measure_once(module) for _ in range(max(1, runs))]
+    import_ms = [times[module][1] / 1000 for times, _ in samples]
+    wall_ms = [wall * 1000 for _, wall in samples]
+    self_ms = {}
+    for times, _ in samples:
+        for name, (self_us, _) in times.items():
+            self_ms.setdefault(name, []).append(self_us / 1000)
+    slowest = sorted(((round(statistics.median(values), 2), name)
+                      for name, values in self_ms.items()), reverse=True)[:top]
+    loaded = samples[-1][0]
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'module': module,
+            'runs': len(samples),
+        },
+        'import_ms': round(statistics.median(import_ms), 2),
+        'wall_ms': round(statistics.median(wall_ms), 2),
+        'slowest': [{'module': name, 'self_ms': ms} for ms, name in slowest],
+        'eager': sorted(name for name in loaded
+                        if name.split('.')[0] in DEFERRED_MODULES),
+    }
+
+
+def run_cli(args):
+    """Handle ``startup`` on the command line"""
+    report = measure(runs=args.runs, top=args.top)
+    print(f"Importing {STARTUP_MODULE}: {report['import_ms']} ms "
+          f"(process {report['wall_ms']} ms, median of {report['meta']['runs']} runs)")
+    for entry in report['slowest']:
+        print(f"  {entry['self_ms']:8.2f} ms  {entry['module']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    status = 0
+    if report['eager']:
+        print(f"Loaded at start-up but should be deferred: {', '.join(report['eager'])}")
+        status = 1
+    if report['import_ms'] > args.target_ms:
+        print(f"OVER TARGET: {report['import_ms']} ms > {args.target_ms} ms")
+        status = 1
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            before = json.load(f)['import_ms']
+        change = report['import_ms'] / before - 1 if before else 0
+        if change > args.threshold:
+            print(f"REGRESSION: {before} -> {report['import_ms']} ms (+{change * 100:.0f}%)")
+            status = 1
+        else:
+            print(f"No regression beyond {args.threshold * 100:.0f}% against {args.baseline}")
+    return status
@@ -0,0 +1,278 @@
+"""Asyncio streaming pipeline for unbounded feeds of payloads (stdin or a growing JSONL file)"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+from qr_batch import MATRIX_FORMAT, get_pipeline, matrix_bytes, output_name
+from qr_output import DEFAULT_OUTPUT_PROFILE
+from qr_render import RenderOptions, draw_qr, render_qr, require_logo
+from qr_verify import decoder_name, describe, is_sampled, verify_result
+from qr_vector import VECTOR_FORMATS
+
+
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_WRITE_BATCH = 64
+DEFAULT_STATS_INTERVAL = 2.0
+FOLLOW_POLL_SECONDS = 0.25
+WRITE_FLUSH_SECONDS = 0.5
+
+_DONE = object()
+
+
+def parse_line(line):
+    """A JSON object per line, or the raw line as the content"""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith('{'):
+        return json.loads(line)
+    return {'content': line}
+
+
+def encode_row(row, defaults):
+    """Worker entry point for the encode stage.
+
+    Lines without content and lines whose logo is missing fail here, for
+    every output format.
+    """
+    options = RenderOptions.from_dict(row, defaults, require_content=True)
+    require_logo(options.logo_path)
+    return options, get_pipeline().cache.encode(options)
+
+
+def render_matrix(matrix, options, fmt, profile=DEFAULT_OUTPUT_PROFILE, verify=False, suggest=False):
+    """Worker entry point for the render stage: draw, add the logo and encode the file.
+
+    Returns ``(data, check)``, where ``check`` holds the verification
+    fields when ``verify`` is set and is None otherwise.
+    """
+    img = None
+    if fmt != MATRIX_FORMAT and fmt not in VECTOR_FORMATS:
+        img = draw_qr(matrix, options)
+    data = matrix_bytes(matrix, options, fmt, profile, img)
+    check = None
+    if verify:
+        check = verify_result(img or draw_qr(matrix, options), options, suggest, render_qr)
+    return data, check
+
+
+def read_lines(source, follow, loop, lines):
+    """Put each line of ``source`` on the asyncio queue ``lines``; runs on a daemon thread.
+
+    An empty string marks the end of the input. With ``follow`` there is
+    no end: EOF is polled until more lines are appended. A readline blocked
+    on an idle pipe in the loop's executor would keep ``asyncio.run`` from
+    returning after Ctrl-C, but a daemon thread is simply abandoned.
+    """
+    try:
+        while True:
+            line = source.readline()
+            if not line and follow:
+                time.sleep(FOLLOW_POLL_SECONDS)
+                continue
+            # Waits for room in the queue, so reading keeps pace with the pipeline
+            asyncio.run_coroutine_threadsafe(lines.put(line), loop).result()
+            if not line:
+                return
+    except (CancelledError, RuntimeError, ValueError):
+        # The loop was stopped, or the source closed, while this thread waited
+        return
+
+
+def write_files(batch):
+    """Write a batch of ``(path, data)`` pairs; runs on a thread"""
+    for path, data in batch:
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+class StreamPipeline:
+    """read -> encode -> render -> write, joined by bounded queues.
+
+    Each queue holds at most ``queue_size`` items, so a slow stage makes the
+    stages before it wait instead of buffering. Memory therefore stays flat
+    however long the feed runs. Encoding and rendering run in a process
+    pool, and finished files are written in batches on a thread.
+    """
+
+    def __init__(self, out_dir, workers=None, fmt='png', defaults=None,
+                 queue_size=DEFAULT_QUEUE_SIZE, write_batch=DEFAULT_WRITE_BATCH,
+                 profile=DEFAULT_OUTPUT_PROFILE, verify_rate=0, suggest=False):
+        self.out_dir = out_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.fmt = fmt
+        self.profile = profile
+        self.verify_rate = verify_rate
+        self.suggest = suggest
+        self.defaults = defaults
+        self.queue_size = queue_size
+        self.write_batch = max(1, write_batch)
+        self.read_count = self.written = self.failed = self.verified = self.unscannable = 0
+        self.queues = {}
+
+    def fail(self, index, error):
+        self.failed += 1
+        print(f"Row {index}: {type(error).__name__}: {error}", file=sys.stderr)
+
+    async def read(self, source, follow, out):
+        """Parse the lines ``read_lines`` delivers; with ``follow`` wait for lines appended at EOF"""
+        lines = asyncio.Queue(self.queue_size)
+        threading.Thread(target=read_lines, args=(source, follow, asyncio.get_running_loop(), lines),
+                         daemon=True).start()
+        index = 0
+        pending = ""
+        while True:
+            line = await lines.get()
+            if not line:
+                break
+            if not line.endswith("\n") and follow:
+                # A writer is midway through this line
+                pending += line
+                continue
+            line, pending = pending + line, ""
+            try:
+                row = parse_line(line)
+            except ValueError as e:
+                self.fail(index, e)
+                index += 1
+                continue
+            if row is None:
+                continue
+            self.read_count += 1
+            await out.put((index, row))
+            index += 1
+
+    async def encode(self, pool, inp, out):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await inp.get()
+            if item is _DONE:
+                return
+            index, row = item
+            try:
+                options, matrix = await loop.run_in_executor(pool, encode_row, row, self.defaults)
+            except Exception as e:
+                self.fail(index, e)
+                continue
+            await out.put((index, row, options, matrix))
+
+    async def render(self, pool, inp, out):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await inp.get()
+            if item is _DONE:
+                return
+            index, row, options, matrix = item
+            try:
+                verify = bool(self.verify_rate) and is_sampled(index, self.verify_rate)
+                data, check = await loop.run_in_executor(pool, render_matrix, matrix, options,
+                                                         self.fmt, self.profile, verify,
+                                                         self.suggest)
+            except Exception as e:
+                self.fail(index, e)
+                continue
+            if check is not None:
+                self.verified += 1
+                if not check['scans']:
+                    self.unscannable += 1
+                    advice = f"; {describe(check['suggestion'])}" if 'suggestion' in check else ""
+                    print(f"Row {index}: does not scan{advice}", file=sys.stderr)
+            await out.put((os.path.join(self.out_dir, output_name(index, row, self.fmt)), data))
+
+    async def write(self, inp):
+        """Collect up to ``write_batch`` files, or whatever arrived within a short wait, per write"""
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            batch = []
+            item = await inp.get()
+            deadline = loop.time() + WRITE_FLUSH_SECONDS
+            while item is not _DONE:
+                batch.append(item)
+                if len(batch) >= self.write_batch:
+                    break
+                try:
+                    item = await asyncio.wait_for(inp.get(), max(0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            finished = item is _DONE
+            if batch:
+                try:
+                    await loop.run_in_executor(None, write_files, batch)
+                    self.written += len(batch)
+                except OSError as e:
+                    self.failed += len(batch)
+                    print(f"Write failed: {e}", file=sys.stderr)
+
+    async def report(self, interval):
+        """Print throughput and queue depths every ``interval`` seconds"""
+        last_written, last_time = 0, time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            rate = (self.written - last_written) / (now - last_time)
+            last_written, last_time = self.written, now
+            depths = " ".join(f"{name}={queue.qsize()}/{queue.maxsize}"
+                              for name, queue in self.queues.items())
+            verified = (f" unscannable {self.unscannable}/{self.verified}"
+                        if self.verify_rate else "")
+            print(f"[stream] read {self.read_count} written {self.written} failed {self.failed}"
+                  f"{verified} | {rate:.1f} codes/s | queues {depths}", file=sys.stderr)
+
+    async def run(self, source, follow=False, stats_interval=DEFAULT_STATS_INTERVAL):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.queues = {name: asyncio.Queue(self.queue_size) for name in ('encode', 'render', 'write')}
+        to_encode, to_render, to_write = self.queues.values()
+        reporter = asyncio.create_task(self.report(stats_interval)) if stats_interval else None
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            encoders = [asyncio.create_task(self.encode(pool, to_encode, to_render))
+                        for _ in range(self.workers)]
+            renderers = [asyncio.create_task(self.render(pool, to_render, to_write))
+                         for _ in range(self.workers)]
+            writer = asyncio.create_task(self.write(to_write))
+            try:
+                await self.read(source, follow, to_encode)
+                # Drain each stage before telling the next one to stop
+                for stage, queue in ((encoders, to_encode), (renderers, to_render)):
+                    for _ in stage:
+                        await queue.put(_DONE)
+                    await asyncio.gather(*stage)
+                await to_write.put(_DONE)
+                await writer
+            finally:
+                for task in encoders + renderers + [writer]:
+                    task.cancel()
+                if reporter:
+                    reporter.cancel()
+        return self.written, self.failed
+
+
+def run_cli(args):
+    """Handle ``stream`` on the command line"""
+    from qr_cli import options_from_args
+
+    defaults = options_from_args(args)
+    if args.verify and decoder_name() is None:
+        print("Verification needs a QR decoder: pip install zxing-cpp (or pyzbar)")
+        return 2
+    pipeline = StreamPipeline(args.output, workers=args.workers, fmt=args.format, defaults=defaults,
+                              queue_size=args.queue_size, write_batch=args.write_batch,
+                              profile=args.profile, verify_rate=args.verify, suggest=args.suggest)
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    try:
+        asyncio.run(pipeline.run(source, follow=args.follow, stats_interval=args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(f"Generated {pipeline.written} QR codes into {args.output} ({pipeline.failed} failed)")
+    if args.verify:
+        print(f"Verified {pipeline.verified} codes with {decoder_name()}: "
+              f"{pipeline.unscannable} did not scan")
+    return 1 if pipeline.failed or pipeline.unscannable else 0
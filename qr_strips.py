@@ -0,0 +1,371 @@
+"""Band-at-a-time rendering for print sizes, streamed straight into PNG or TIFF files"""
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+from PIL import Image, ImageChops
+
+from qr_output import DEFAULT_OUTPUT_PROFILE, PNG_SETTINGS, TWO_COLOUR_PNG_SETTINGS
+from qr_render import encode, hex_to_rgb, load_logo, logo_fingerprint
+from qr_styles import get_style
+
+
+STRIP_FORMATS = ('png', 'tif', 'tiff')
+DEFAULT_BAND_BYTES = 16 * 1024 * 1024
+
+# Logo padding on each side of the tile, as in logo_overlay
+LOGO_PAD = 10
+
+# Compressed data is written in IDAT chunks of about this size
+PNG_CHUNK_BYTES = 256 * 1024
+
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_RATIONAL = 5
+TIFF_ADOBE_DEFLATE = 8
+
+
+def band_rows(pixel_size, box_size, band_bytes=DEFAULT_BAND_BYTES):
+    """Pixel rows per band that keep one RGB band within ``band_bytes``.
+
+    Bands are whole module rows where the budget allows it, so square
+    modules are never split between two bands.
+    """
+    rows = max(1, band_bytes // (pixel_size * 3))
+    return rows - rows % box_size if rows >= box_size else rows
+
+
+class LogoTile:
+    """The ``logo_overlay`` tile of one code, handed out a band of rows at a time.
+
+    Pillow resizes in a horizontal pass and then a vertical one. Resizing
+    just the rows a band needs shifts the vertical filter by rounding
+    error, so the logo is instead resized once, each pass run the way a
+    full resize runs it: the horizontal pass over slices of source rows,
+    the vertical pass over strips of columns. Both passes spill to a
+    temporary file, so memory stays within ``budget`` bytes per slice, and
+    every band gets exactly the rows of the full resize.
+    """
+
+    def __init__(self, logo_path, fingerprint, logo_size, bg_color, budget=DEFAULT_BAND_BYTES):
+        logo = load_logo(logo_path, fingerprint)
+        self.logo_size = logo_size
+        self.bg_color = bg_color
+        self.masked = logo.mode == 'RGBA'
+        self.final_mode = logo.mode
+        resample = Image.Resampling.LANCZOS
+        if logo.mode in ('1', 'P'):
+            # Image.resize samples these with NEAREST, which commutes with the
+            # conversion paste would apply anyway
+            logo = logo.convert('RGBA')
+            self.final_mode = 'RGBA'
+            resample = Image.Resampling.NEAREST
+        elif logo.mode in ('LA', 'RGBA'):
+            # Image.resize works on premultiplied alpha
+            logo = logo.convert({'LA': 'La', 'RGBA': 'RGBa'}[logo.mode])
+        self.mode = logo.mode
+        pixel_bytes = len(Image.new(self.mode, (1, 1)).tobytes())
+        width, height = logo.size
+        self.file = tempfile.TemporaryFile()
+
+        # Horizontal pass: whole source rows, logo_size wide, stored row by row
+        row_bytes = logo_size * pixel_bytes
+        rows = max(1, budget // (max(row_bytes, width * pixel_bytes)))
+        for top in range(0, height, rows):
+            bottom = min(top + rows, height)
+            self.file.write(logo.crop((0, top, width, bottom))
+                            .resize((logo_size, bottom - top), resample).tobytes())
+
+        # Vertical pass: strips of columns, full height, each stored after the last
+        columns = max(1, budget // (max(logo_size, height) * pixel_bytes))
+        self.strips = []
+        offset = height * row_bytes
+        for left in range(0, logo_size, columns):
+            right = min(left + columns, logo_size)
+            strip_bytes = (right - left) * pixel_bytes
+            data = bytearray()
+            for row in range(height):
+                self.file.seek(row * row_bytes + left * pixel_bytes)
+                data += self.file.read(strip_bytes)
+            strip = Image.frombytes(self.mode, (right - left, height), bytes(data))
+            self.file.seek(offset)
+            self.file.write(strip.resize((right - left, logo_size), resample).tobytes())
+            self.strips.append((left, right - left, offset, strip_bytes))
+            offset += logo_size * strip_bytes
+
+    def rows(self, top, bottom):
+        """Rows ``top`` to ``bottom`` of the tile as ``(RGB image, mask or None)``"""
+        band = Image.new('RGBA', (self.logo_size + LOGO_PAD * 2, bottom - top), self.bg_color)
+        first, last = max(top - LOGO_PAD, 0), min(bottom - LOGO_PAD, self.logo_size)
+        if first < last:
+            part = Image.new(self.mode, (self.logo_size, last - first))
+            for left, width, offset, strip_bytes in self.strips:
+                self.file.seek(offset + first * strip_bytes)
+                data = self.file.read((last - first) * strip_bytes)
+                part.paste(Image.frombytes(self.mode, (width, last - first), data), (left, 0))
+            if part.mode != self.final_mode:
+                part = part.convert(self.final_mode)
+            position = (LOGO_PAD, first + LOGO_PAD - top)
+            if self.masked:
+                band.paste(part, position, part)
+            else:
+                band.paste(part, position)
+
+        alpha = band.getchannel('A')
+        mask = None if alpha.getextrema() == (255, 255) else alpha
+        return band.convert('RGB'), mask
+
+    def close(self):
+        self.file.close()
+
+
+def iter_bands(matrix, options, band_bytes=DEFAULT_BAND_BYTES):
+    """Yield the rendered code top to bottom, a band of pixel rows at a time.
+
+    Only one band and the part of the logo tile it crosses are in memory at
+    once, however large the code. Stacked, the bands are the pixels
+    ``render_qr`` would return. Square codes without a logo come out as
+    two-entry palette bands.
+    """
+    style = get_style(options.module_style)
+    fg_rgb, bg_rgb = hex_to_rgb(options.fg_color), hex_to_rgb(options.bg_color)
+    box_size = options.box_size
+    pixel_size = (matrix.size + options.border * 2) * box_size
+    rows = band_rows(pixel_size, box_size, band_bytes)
+
+    fingerprint = logo_fingerprint(options.logo_path)
+    logo = None
+    if fingerprint:
+        # The same tile size and position as add_logo_to_qr
+        logo_size = pixel_size * options.logo_percent // 100
+        tile = logo_size + LOGO_PAD * 2
+        tile_pos = (pixel_size - tile) // 2
+
+    try:
+        for y0 in range(0, pixel_size, rows):
+            y1 = min(y0 + rows, pixel_size)
+            band = style.render_band(matrix, box_size, options.border, fg_rgb, bg_rgb, y0, y1)
+            if fingerprint and y0 < tile_pos + tile and tile_pos < y1:
+                if logo is None:
+                    logo = LogoTile(options.logo_path, fingerprint, logo_size, options.bg_color,
+                                    band_bytes)
+                first, last = max(y0, tile_pos), min(y1, tile_pos + tile)
+                overlay, mask = logo.rows(first - tile_pos, last - tile_pos)
+                if band.mode != 'RGB':
+                    band = band.convert('RGB')
+                band.paste(overlay, (tile_pos, first - y0), mask)
+            yield band
+    finally:
+        if logo is not None:
+            logo.close()
+
+
+def _png_chunk(kind, data):
+    chunk = kind + data
+    return struct.pack('>I', len(data)) + chunk + struct.pack('>I', zlib.crc32(chunk))
+
+
+class PNGStripWriter:
+    """Writes a PNG band by band, compressing each band as it arrives.
+
+    With a two-colour ``palette`` rows are packed one bit per pixel,
+    otherwise they are 8-bit RGB with the Up filter, which turns the
+    repeated pixel rows inside each module row into runs of zeros.
+    """
+
+    def __init__(self, f, width, height, palette=None, profile=DEFAULT_OUTPUT_PROFILE, dpi=None):
+        self.f = f
+        self.width = width
+        self.palette = palette
+        self.bytes_written = 0
+        self._previous = None
+        settings = (TWO_COLOUR_PNG_SETTINGS if palette else PNG_SETTINGS)[profile]
+        self._compressor = zlib.compressobj(settings['compress_level'], zlib.DEFLATED, 15, 9,
+                                            settings.get('compress_type', zlib.Z_DEFAULT_STRATEGY))
+        self._pending = []
+        self._pending_bytes = 0
+
+        depth, colour_type = (1, 3) if palette else (8, 2)
+        self._write(b'\x89PNG\r\n\x1a\n')
+        self._write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, depth, colour_type,
+                                                    0, 0, 0)))
+        if dpi:
+            per_metre = int(round(dpi / 0.0254))
+            self._write(_png_chunk(b'pHYs', struct.pack('>IIB', per_metre, per_metre, 1)))
+        if palette:
+            self._write(_png_chunk(b'PLTE', bytes(palette)))
+
+    def _write(self, data):
+        self.f.write(data)
+        self.bytes_written += len(data)
+
+    def _compress(self, data):
+        out = self._compressor.compress(data)
+        if out:
+            self._pending.append(out)
+            self._pending_bytes += len(out)
+            if self._pending_bytes >= PNG_CHUNK_BYTES:
+                self._flush_pending()
+
+    def _flush_pending(self):
+        if self._pending:
+            self._write(_png_chunk(b'IDAT', b''.join(self._pending)))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def write(self, band):
+        if self.palette:
+            data = band.tobytes('raw', 'P;1')
+            stride, filter_type = (self.width + 7) // 8, b'\x00'
+        else:
+            if band.mode != 'RGB':
+                band = band.convert('RGB')
+            # Up filter: each row minus the row above it, computed for the whole band at once
+            above = Image.new('RGB', band.size)
+            if self._previous is not None:
+                above.paste(self._previous, (0, 0))
+            above.paste(band.crop((0, 0, band.width, band.height - 1)), (0, 1))
+            self._previous = band.crop((0, band.height - 1, band.width, band.height))
+            data = ImageChops.subtract_modulo(band, above).tobytes()
+            stride, filter_type = self.width * 3, b'\x02'
+        for start in range(0, len(data), stride):
+            self._compress(filter_type + data[start:start + stride])
+
+    def close(self):
+        self._pending.append(self._compressor.flush())
+        self._pending_bytes = PNG_CHUNK_BYTES
+        self._flush_pending()
+        self._write(_png_chunk(b'IEND', b''))
+
+
+class TIFFStripWriter:
+    """Writes a baseline RGB TIFF with one Deflate-compressed strip per band.
+
+    Strip offsets are only known at the end, so the directory is written
+    last and ``f`` must be seekable. Every band but the last must have the
+    height of the first.
+    """
+
+    def __init__(self, f, width, height, profile=DEFAULT_OUTPUT_PROFILE, dpi=None):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.level = PNG_SETTINGS[profile]['compress_level']
+        self.rows_per_strip = None
+        self.offsets = []
+        self.counts = []
+        f.write(b'II*\x00\x00\x00\x00\x00')  # the directory offset is filled in by close()
+        self.bytes_written = 8
+
+    def write(self, band):
+        if band.mode != 'RGB':
+            band = band.convert('RGB')
+        if self.rows_per_strip is None:
+            self.rows_per_strip = band.height
+        data = zlib.compress(band.tobytes(), self.level)
+        self.offsets.append(self.bytes_written)
+        self.counts.append(len(data))
+        self.f.write(data)
+        self.bytes_written += len(data)
+
+    def close(self):
+        if self.bytes_written % 2:
+            self.f.write(b'\x00')
+            self.bytes_written += 1
+        entries = 13
+        ifd_offset = self.bytes_written
+        extra = ifd_offset + 2 + entries * 12 + 4
+        # Values that do not fit in a directory entry follow the directory
+        bits_offset = extra
+        offsets_offset = bits_offset + 6
+        counts_offset = offsets_offset + 4 * len(self.offsets)
+        resolution_offset = counts_offset + 4 * len(self.counts)
+        if resolution_offset + 16 > 0xFFFFFFFF:
+            raise ValueError("Output is too large for a classic TIFF file")
+
+        def entry(tag, kind, count, value):
+            if kind == TIFF_SHORT and count == 1:
+                return struct.pack('<HHIHH', tag, kind, count, value, 0)
+            return struct.pack('<HHII', tag, kind, count, value)
+
+        strips = len(self.offsets)
+        directory = [
+            entry(256, TIFF_LONG, 1, self.width),
+            entry(257, TIFF_LONG, 1, self.height),
+            entry(258, TIFF_SHORT, 3, bits_offset),
+            entry(259, TIFF_SHORT, 1, TIFF_ADOBE_DEFLATE),
+            entry(262, TIFF_SHORT, 1, 2),  # RGB
+            entry(273, TIFF_LONG, strips, self.offsets[0] if strips == 1 else offsets_offset),
+            entry(277, TIFF_SHORT, 1, 3),
+            entry(278, TIFF_LONG, 1, self.rows_per_strip or self.height),
+            entry(279, TIFF_LONG, strips, self.counts[0] if strips == 1 else counts_offset),
+            entry(282, TIFF_RATIONAL, 1, resolution_offset),
+            entry(283, TIFF_RATIONAL, 1, resolution_offset + 8),
+            entry(284, TIFF_SHORT, 1, 1),  # chunky
+            entry(296, TIFF_SHORT, 1, 2),  # inches
+        ]
+        dpi = int(round(self.dpi or 72))
+        self.f.write(struct.pack('<H', entries) + b''.join(directory) + struct.pack('<I', 0))
+        self.f.write(struct.pack('<HHH', 8, 8, 8))
+        self.f.write(struct.pack(f'<{strips}I', *self.offsets))
+        self.f.write(struct.pack(f'<{strips}I', *self.counts))
+        self.f.write(struct.pack('<IIII', dpi, 1, dpi, 1))
+        self.bytes_written = resolution_offset + 16
+        self.f.seek(4)
+        self.f.write(struct.pack('<I', ifd_offset))
+        self.f.seek(0, os.SEEK_END)
+
+
+def save_strips(options, path, fmt=None, profile=DEFAULT_OUTPUT_PROFILE, dpi=None,
+                band_bytes=DEFAULT_BAND_BYTES, matrix=None):
+    """Render ``options`` into a PNG or TIFF file band by band.
+
+    Returns ``(bytes written, seconds)`` like ``save_image``. Peak memory
+    stays at a few times ``band_bytes`` whatever the output size.
+    """
+    fmt = (fmt or path.rsplit('.', 1)[-1]).lower()
+    if fmt not in STRIP_FORMATS:
+        raise ValueError(f"Band rendering writes PNG or TIFF, not {fmt}")
+    start = time.perf_counter()
+    if matrix is None:
+        matrix = encode(options.content, options.error_level)
+    pixel_size = (matrix.size + options.border * 2) * options.box_size
+    two_colour = (options.module_style == "Square" and not logo_fingerprint(options.logo_path))
+    with open(path, 'wb') as f:
+        if fmt == 'png':
+            palette = None
+            if two_colour:
+                fg_rgb, bg_rgb = hex_to_rgb(options.fg_color), hex_to_rgb(options.bg_color)
+                palette = bg_rgb + (bg_rgb if bg_rgb == (0, 0, 0) else fg_rgb)
+            writer = PNGStripWriter(f, pixel_size, pixel_size, palette, profile, dpi)
+        else:
+            writer = TIFFStripWriter(f, pixel_size, pixel_size, profile, dpi)
+        for band in iter_bands(matrix, options, band_bytes):
+            writer.write(band)
+        writer.close()
+    return writer.bytes_written, time.perf_counter() - start
+
+
+def run_cli(args):
+    """Handle ``poster`` on the command line"""
+    from qr_bench import peak_rss_mb
+    from qr_cli import options_from_args
+    from qr_render import require_logo
+
+    options = options_from_args(args, content=args.content)
+    try:
+        require_logo(options.logo_path)
+    except FileNotFoundError as e:
+        print(e)
+        return 1
+    matrix = encode(options.content, options.error_level)
+    size, seconds = save_strips(options, args.output, profile=args.profile, dpi=args.dpi,
+                                band_bytes=args.band_mb * 1024 * 1024, matrix=matrix)
+    pixel_size = (matrix.size + options.border * 2) * options.box_size
+    rss = peak_rss_mb()
+    print(f"Wrote {args.output}: {pixel_size}x{pixel_size} px, {size / 1024 / 1024:.1f} MiB "
+          f"in {seconds:.1f} s" + (f", peak RSS {rss:.0f} MiB" if rss else ""))
+    return 0
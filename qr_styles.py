@@ -0,0 +1,233 @@
+"""Module style registry: each style pre-rasterises its module stamps once and pastes them"""
+from collections import OrderedDict
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+from qrcode.image.styles.colormasks import SolidFillColorMask
+from qrcode.image.styles.moduledrawers.pil import ANTIALIASING_FACTOR
+
+
+# Stamps are drawn in this colour on the background, then recoloured the
+# way SolidFillColorMask recolours a whole StyledPilImage
+PAINT_COLOR = (0, 0, 0)
+
+# Stamp variant used for the finder patterns, which are always square
+EYE = 'eye'
+
+_styles = OrderedDict()
+
+
+def is_eye(row, col, width):
+    """Finder patterns are always drawn square, as StyledPilImage does"""
+    return (
+        (row < 7 and col < 7)
+        or (row < 7 and width - col < 8)
+        or (width - row < 8 and col < 7)
+    )
+
+
+def recolour(stamp, bg_rgb, fg_rgb):
+    """Apply SolidFillColorMask to a stamp drawn in PAINT_COLOR on ``bg_rgb``.
+
+    The mask maps every pixel by its colour alone, so recolouring each stamp
+    once gives the same pixels as masking every finished code.
+    """
+    if bg_rgb == (255, 255, 255) and fg_rgb == (0, 0, 0):
+        return stamp  # the mask leaves black on white untouched
+    mask = SolidFillColorMask(back_color=bg_rgb, front_color=fg_rgb)
+    mapping = {}
+    for _, color in stamp.getcolors(stamp.width * stamp.height):
+        if color == bg_rgb:
+            mapping[color] = color
+            continue
+        norm = mask.extrap_color(bg_rgb, PAINT_COLOR, color)
+        mapping[color] = bg_rgb if norm is None else mask.interp_color(bg_rgb, fg_rgb, norm)
+    recoloured = Image.new('RGB', stamp.size)
+    recoloured.putdata([mapping[color] for color in stamp.getdata()])
+    return recoloured
+
+
+class ModuleStyle:
+    """How dark modules are drawn.
+
+    A style draws one ``box_size`` square module in PAINT_COLOR on the
+    background colour with ``draw_stamp``. Styles whose modules depend on
+    their neighbours name the variant a module needs with ``variant``; a
+    stamp is drawn once per variant, size and colour pair and then pasted
+    for every module. Styles that can do better than pasting stamps
+    override ``render_band``. ``vector_shape`` tells the SVG/PDF export which of
+    its shapes to use ('square', 'rounded' or 'circle'), or None when the
+    style has no vector form.
+    """
+    name = None
+    vector_shape = None
+
+    def variant(self, north, east, south, west):
+        return None
+
+    def draw_stamp(self, box_size, bg_rgb, variant):
+        raise NotImplementedError
+
+    def stamp(self, box_size, bg_rgb, fg_rgb, variant):
+        return _stamp(self.name, box_size, bg_rgb, fg_rgb, variant)
+
+    def render(self, matrix, box_size, border, fg_rgb, bg_rgb):
+        """Draw ``matrix`` as an RGB image"""
+        height = (matrix.size + border * 2) * box_size
+        img = self.render_band(matrix, box_size, border, fg_rgb, bg_rgb, 0, height)
+        return img if img.mode == 'RGB' else img.convert('RGB')
+
+    def render_band(self, matrix, box_size, border, fg_rgb, bg_rgb, top, bottom):
+        """Draw pixel rows ``top`` to ``bottom`` of the code by pasting one stamp per dark module.
+
+        Rows are counted from the top of the quiet zone, and stamps cut by the
+        band edges are clipped by the paste. Implementations may return a
+        palette image.
+        """
+        size = matrix.size
+        width = (size + border * 2) * box_size
+        img = Image.new('RGB', (width, bottom - top), bg_rgb)
+        stamps = {}
+        blank = [False] * size
+        first = max(top // box_size - border, 0)
+        last = min(-(-bottom // box_size) - border, size)
+        if first >= last:
+            return img
+        rows = [matrix.row(row) for row in range(max(first - 1, 0), min(last + 1, size))]
+        offset = max(first - 1, 0)
+        above = rows[first - 1 - offset] if first > 0 else blank
+        for row in range(first, last):
+            cells = rows[row - offset]
+            below = rows[row + 1 - offset] if row + 1 < size else blank
+            y = (row + border) * box_size - top
+            for col in range(size):
+                if not cells[col]:
+                    continue
+                if is_eye(row, col, size):
+                    key = EYE
+                else:
+                    key = self.variant(above[col], col + 1 < size and cells[col + 1],
+                                       below[col], col > 0 and cells[col - 1])
+                stamp = stamps.get(key)
+                if stamp is None:
+                    stamp = stamps[key] = self.stamp(box_size, bg_rgb, fg_rgb, key)
+                img.paste(stamp, ((col + border) * box_size, y))
+            above = cells
+        return img
+
+
+@lru_cache(maxsize=256)
+def _stamp(name, box_size, bg_rgb, fg_rgb, variant):
+    if variant == EYE:
+        drawn = Image.new('RGB', (box_size, box_size), PAINT_COLOR)
+    else:
+        drawn = _styles[name].draw_stamp(box_size, bg_rgb, variant)
+    return recolour(drawn, bg_rgb, fg_rgb)
+
+
+class SquareStyle(ModuleStyle):
+    name = "Square"
+    vector_shape = 'square'
+
+    def draw_stamp(self, box_size, bg_rgb, variant):
+        return Image.new('RGB', (box_size, box_size), PAINT_COLOR)
+
+    def render_band(self, matrix, box_size, border, fg_rgb, bg_rgb, top, bottom):
+        """Render square modules straight from the packed matrix.
+
+        Unpacks the bits into a one-byte-per-module palette image, scales it up
+        with a nearest-neighbour resize and lets the two-entry palette supply
+        the colours. Produces the same pixels as pasting square stamps at a
+        fraction of the cost. The result stays a palette image, with the
+        background at index 0 and the modules at index 1.
+        """
+        width = matrix.size + border * 2
+        first, last = top // box_size, -(-bottom // box_size)
+
+        # SolidFillColorMask cannot tell modules painted black apart from a
+        # black background, so the styled pipeline renders those codes solid.
+        if bg_rgb == (0, 0, 0):
+            fg_rgb = bg_rgb
+
+        img = Image.new('P', (width, last - first), 0)
+        img.paste(matrix.to_image(), (border, border - first))
+        img.putpalette(bg_rgb + fg_rgb)
+        # Only the module rows the band crosses are unpacked; the resize box picks its pixel rows
+        offset = top - first * box_size
+        return img.resize((width * box_size, bottom - top), Image.Resampling.NEAREST,
+                          box=(0, offset / box_size, width, (offset + bottom - top) / box_size))
+
+
+class CircleStyle(ModuleStyle):
+    """The circle of qrcode's CircleModuleDrawer"""
+    name = "Circle"
+    vector_shape = 'circle'
+
+    def draw_stamp(self, box_size, bg_rgb, variant):
+        fake_size = box_size * ANTIALIASING_FACTOR
+        circle = Image.new('RGB', (fake_size, fake_size), bg_rgb)
+        ImageDraw.Draw(circle).ellipse((0, 0, fake_size, fake_size), fill=PAINT_COLOR)
+        return circle.resize((box_size, box_size), Image.Resampling.LANCZOS)
+
+
+class RoundedStyle(ModuleStyle):
+    """qrcode's RoundedModuleDrawer: corners with no dark neighbour on either side are rounded"""
+    name = "Rounded"
+    vector_shape = 'rounded'
+
+    def variant(self, north, east, south, west):
+        # (nw, ne, se, sw) corners that are rounded
+        return (not north and not west, not north and not east,
+                not south and not east, not south and not west)
+
+    def draw_stamp(self, box_size, bg_rgb, variant):
+        corner_width = int(box_size / 2)
+        square = Image.new('RGB', (corner_width, corner_width), PAINT_COLOR)
+        nw_round = self._corner(corner_width, bg_rgb)
+        rounded = (nw_round, nw_round.transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+                   nw_round.transpose(Image.Transpose.ROTATE_180),
+                   nw_round.transpose(Image.Transpose.FLIP_TOP_BOTTOM))
+        # With an odd box size the last row and column stay background
+        stamp = Image.new('RGB', (box_size, box_size), bg_rgb)
+        offsets = ((0, 0), (corner_width, 0), (corner_width, corner_width), (0, corner_width))
+        for is_round, corner, offset in zip(variant, rounded, offsets):
+            stamp.paste(corner if is_round else square, offset)
+        return stamp
+
+    @staticmethod
+    def _corner(corner_width, bg_rgb):
+        # Drawn exactly as RoundedModuleDrawer.setup_corners with radius_ratio=1
+        fake_width = corner_width * ANTIALIASING_FACTOR
+        radius = fake_width
+        base = Image.new('RGB', (fake_width, fake_width), bg_rgb)
+        draw = ImageDraw.Draw(base)
+        draw.ellipse((0, 0, radius * 2, radius * 2), fill=PAINT_COLOR)
+        draw.rectangle((radius, 0, fake_width, fake_width), fill=PAINT_COLOR)
+        draw.rectangle((0, radius, fake_width, fake_width), fill=PAINT_COLOR)
+        return base.resize((corner_width, corner_width), Image.Resampling.LANCZOS)
+
+
+def register_style(style, replace=False):
+    """Make a ModuleStyle instance available by its ``name``"""
+    if not style.name:
+        raise ValueError("A module style needs a name")
+    if style.name in _styles and not replace:
+        raise ValueError(f"Module style already registered: {style.name}")
+    _styles[style.name] = style
+    _stamp.cache_clear()
+    return style
+
+
+def get_style(name):
+    style = _styles.get(name)
+    if style is None:
+        raise ValueError(f"Unknown module style: {name}")
+    return style
+
+
+def style_names():
+    return tuple(_styles)
+
+
+for _style in (SquareStyle(), RoundedStyle(), CircleStyle()):
+    register_style(_style)
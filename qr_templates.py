@@ -0,0 +1,124 @@
+"""Render ranges of ids against named style templates saved from the app"""
+import json
+import os
+
+import qrcode
+from qrcode.util import optimal_data_chunks
+
+from qr_batch import write_results
+from qr_render import ERROR_LEVELS, RenderOptions
+
+
+DEFAULT_SETTINGS_PATH = 'qr_settings.json'
+
+# Style fields a template stores; the payload and size come from each run
+TEMPLATE_FIELDS = ('error_level', 'module_style', 'fg_color', 'bg_color', 'logo_path', 'logo_percent')
+
+
+def load_templates(path=DEFAULT_SETTINGS_PATH):
+    """The ``templates`` saved in a settings file, by name"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('templates') or {}
+
+
+def template_options(template, box_size=20):
+    """RenderOptions for a template, with the content left to each row"""
+    return RenderOptions.from_dict({field: template.get(field) for field in TEMPLATE_FIELDS},
+                                   RenderOptions(box_size=box_size))
+
+
+def parse_ids(spec):
+    """Yield the ids in a spec such as ``1-100000`` or ``1-9,20,30-40:2`` (ranges are inclusive)"""
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        span, _, step = part.partition(':')
+        first, sep, last = span.partition('-')
+        if not sep:
+            yield int(first)
+            continue
+        yield from range(int(first), int(last) + 1, int(step or 1))
+
+
+def read_ids(path):
+    """Yield one id per non-blank line; all-digit ids are yielded as ints"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield int(line) if line.isdigit() else line
+
+
+def fit_version(content, error_level):
+    """The version ``content`` encodes at, without picking a mask or drawing anything"""
+    qr = qrcode.QRCode(version=1, error_correction=ERROR_LEVELS[error_level])
+    qr.add_data(content)
+    try:
+        return qr.best_fit(start=1)
+    except Exception:
+        return 41  # too long; the row reports the error when it is rendered
+
+
+def chunk_signature(content):
+    """The modes and lengths ``add_data`` splits ``content`` into, which fix its version"""
+    return tuple((chunk.mode, len(chunk.data)) for chunk in optimal_data_chunks(content, minimum=20))
+
+
+def pattern_error(pattern):
+    """Why ``pattern`` cannot be filled in with an id, or None if it can"""
+    try:
+        pattern.format(id=0)
+    except (KeyError, IndexError, ValueError) as e:
+        return f"{pattern!r} cannot be filled in with an id; use {{id}} ({type(e).__name__}: {e})"
+    return None
+
+
+def version_sorted_rows(ids, payload, name, error_level):
+    """Manifest rows for ``ids``, ordered by QR version and then by id order.
+
+    Consecutive codes of one version share their pixel size, so each
+    worker's size-keyed caches (logo overlay, module stamps) stay hot. The
+    version depends only on the encoding modes and lengths of the payload's
+    chunks, so it is worked out once per chunk signature rather than per id.
+    Returns the rows and a count per version.
+    """
+    versions = {}
+    keyed = []
+    for index, id_ in enumerate(ids):
+        content = payload.format(id=id_)
+        signature = chunk_signature(content)
+        if signature not in versions:
+            versions[signature] = fit_version(content, error_level)
+        keyed.append((versions[signature], index, {'content': content, 'filename': name.format(id=id_)}))
+    keyed.sort(key=lambda item: item[:2])
+    counts = {}
+    for version, _, _ in keyed:
+        counts[version] = counts.get(version, 0) + 1
+    return [(index, row) for _, index, row in keyed], counts
+
+
+def run_cli(args):
+    """Handle ``template`` on the command line"""
+    templates = load_templates(args.settings)
+    if args.template not in templates:
+        names = ", ".join(sorted(templates)) or "none saved yet"
+        print(f"No template named {args.template!r} in {args.settings} ({names})")
+        return 2
+    if not args.ids and not args.ids_file:
+        print("Give the ids to render with --ids or --ids-file")
+        return 2
+    for option, pattern in (('--payload', args.payload), ('--name', args.name)):
+        error = pattern_error(pattern)
+        if error:
+            print(f"Invalid {option}: {error}")
+            return 2
+
+    defaults = template_options(templates[args.template], args.box_size)
+    ids = read_ids(args.ids_file) if args.ids_file else parse_ids(args.ids)
+    rows, counts = version_sorted_rows(ids, args.payload, args.name, defaults.error_level)
+    print(f"Rendering {len(rows)} codes with template {args.template!r}: " +
+          ", ".join(f"{count} at version {version}" for version, count in sorted(counts.items())))
+    return write_results(args, rows, defaults)
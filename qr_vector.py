@@ -0,0 +1,326 @@
+"""Streaming SVG and PDF export driven straight from the module matrix"""
+import base64
+import os
+import zlib
+
+from qr_metrics import metrics
+from qr_render import DEFAULT_LOGO_PERCENT, hex_to_rgb, load_logo, logo_fingerprint
+from qr_styles import get_style, is_eye
+
+
+VECTOR_FORMATS = ('svg', 'pdf')
+
+LOGO_MIME_TYPES = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'GIF': 'image/gif',
+    'BMP': 'image/bmp',
+    'TIFF': 'image/tiff',
+}
+
+# Control point distance for approximating a quarter circle with a Bezier curve
+KAPPA = 0.5522847498
+
+
+def _runs(cells):
+    """Yield ``(start, end)`` column ranges of consecutive True cells"""
+    start = None
+    for col, cell in enumerate(cells):
+        if cell and start is None:
+            start = col
+        elif not cell and start is not None:
+            yield start, col
+            start = None
+    if start is not None:
+        yield start, len(cells)
+
+
+def iter_shapes(matrix, module_style):
+    """Yield the primitives that draw ``matrix`` in module coordinates.
+
+    Modules that end up as plain squares are merged: runs of dark modules
+    along a row become one rectangle, and identical runs in the rows below
+    extend that rectangle downwards. This keeps files small. Circle modules
+    yield ``('circle', row, col)``. Rounded modules with at least one
+    rounded corner yield ``('rounded', row, col, (nw, ne, se, sw))``.
+    Rectangles are ``('rect', row, col, rows, cols)``. The shape used
+    for each style is its ``vector_shape`` in the qr_styles registry.
+    """
+    shape = get_style(module_style).vector_shape
+    if shape is None:
+        raise ValueError(f"{module_style} modules cannot be exported as SVG or PDF")
+    size = matrix.size
+    open_runs = {}
+
+    for row in range(size + 1):
+        squares = [False] * size
+        if row < size:
+            cells = matrix.row(row)
+            for col in range(size):
+                if not cells[col]:
+                    continue
+                if shape == 'square' or is_eye(row, col, size):
+                    squares[col] = True
+                elif shape == 'circle':
+                    yield ('circle', row, col)
+                else:
+                    n = matrix.is_dark(row - 1, col)
+                    e = matrix.is_dark(row, col + 1)
+                    s = matrix.is_dark(row + 1, col)
+                    w = matrix.is_dark(row, col - 1)
+                    corners = (not n and not w, not n and not e, not s and not e, not s and not w)
+                    if any(corners):
+                        yield ('rounded', row, col, corners)
+                    else:
+                        squares[col] = True
+
+        runs = set(_runs(squares))
+        for run in [run for run in open_runs if run not in runs]:
+            top = open_runs.pop(run)
+            yield ('rect', top, run[0], row - top, run[1] - run[0])
+        for run in runs:
+            open_runs.setdefault(run, row)
+
+
+def logo_box(pixel_size, percent=DEFAULT_LOGO_PERCENT):
+    """Padded logo square and logo square, matching the raster add_logo_to_qr layout"""
+    logo_size = pixel_size * percent // 100
+    pad_size = logo_size + 20
+    pad_pos = (pixel_size - pad_size) // 2
+    return (pad_pos, pad_size), (pad_pos + (pad_size - logo_size) // 2, logo_size)
+
+
+def _num(value):
+    return f"{value:.3f}".rstrip('0').rstrip('.')
+
+
+def write_svg(f, matrix, options):
+    """Write an SVG to the text file ``f``, one path command at a time"""
+    box = options.box_size
+    offset = options.border * box
+    pixel_size = (matrix.size + options.border * 2) * box
+    half = box / 2
+
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write(f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'version="1.1" width="{pixel_size}" height="{pixel_size}" '
+            f'viewBox="0 0 {pixel_size} {pixel_size}">\n')
+    f.write(f'<rect width="{pixel_size}" height="{pixel_size}" fill="{options.bg_color}"/>\n')
+    f.write(f'<path fill="{options.fg_color}" d="')
+
+    for shape in iter_shapes(matrix, options.module_style):
+        x = offset + shape[2] * box
+        y = offset + shape[1] * box
+        if shape[0] == 'rect':
+            f.write(f"M{x} {y}h{shape[4] * box}v{shape[3] * box}h{-shape[4] * box}z")
+        elif shape[0] == 'circle':
+            f.write(f"M{x} {_num(y + half)}a{_num(half)} {_num(half)} 0 1 0 {box} 0"
+                    f"a{_num(half)} {_num(half)} 0 1 0 {-box} 0z")
+        else:
+            f.write(_svg_rounded(x, y, box, shape[3]))
+    f.write('"/>\n')
+
+    if options.logo_path and logo_fingerprint(options.logo_path):
+        _write_svg_logo(f, options, pixel_size)
+    f.write('</svg>\n')
+
+
+def _svg_rounded(x, y, box, corners):
+    nw, ne, se, sw = corners
+    r = _num(box / 2)
+    half = box / 2
+    parts = [f"M{_num(x + (half if nw else 0))} {y}",
+             f"H{_num(x + box - (half if ne else 0))}"]
+    if ne:
+        parts.append(f"A{r} {r} 0 0 1 {x + box} {_num(y + half)}")
+    parts.append(f"V{_num(y + box - (half if se else 0))}")
+    if se:
+        parts.append(f"A{r} {r} 0 0 1 {_num(x + box - half)} {y + box}")
+    parts.append(f"H{_num(x + (half if sw else 0))}")
+    if sw:
+        parts.append(f"A{r} {r} 0 0 1 {x} {_num(y + box - half)}")
+    parts.append(f"V{_num(y + (half if nw else 0))}")
+    if nw:
+        parts.append(f"A{r} {r} 0 0 1 {_num(x + half)} {y}")
+    parts.append("z")
+    return "".join(parts)
+
+
+def _write_svg_logo(f, options, pixel_size):
+    (pad_pos, pad_size), (logo_pos, logo_size) = logo_box(pixel_size, options.logo_percent)
+    fingerprint = logo_fingerprint(options.logo_path)
+    mime = LOGO_MIME_TYPES.get(load_logo(options.logo_path, fingerprint).format, 'image/png')
+
+    f.write(f'<rect x="{pad_pos}" y="{pad_pos}" width="{pad_size}" height="{pad_size}" '
+            f'fill="{options.bg_color}"/>\n')
+    f.write(f'<image x="{logo_pos}" y="{logo_pos}" width="{logo_size}" height="{logo_size}" '
+            f'preserveAspectRatio="none" xlink:href="data:{mime};base64,')
+    # The original file is embedded as-is, base64-encoded in chunks
+    with open(options.logo_path, 'rb') as logo_file:
+        for chunk in iter(lambda: logo_file.read(57 * 1024), b''):
+            f.write(base64.b64encode(chunk).decode('ascii'))
+    f.write('"/>\n')
+
+
+class _PdfWriter:
+    """Just enough of a PDF writer to stream objects and build the xref table"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.position = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('latin-1')
+        self.f.write(data)
+        self.position += len(data)
+
+    def begin(self, number):
+        self.offsets[number] = self.position
+        self.write(f"{number} 0 obj\n")
+
+    def end(self):
+        self.write("endobj\n")
+
+    def obj(self, number, body):
+        self.begin(number)
+        self.write(body + "\n")
+        self.end()
+
+    def stream(self, number, header, data):
+        self.begin(number)
+        self.write(f"<< {header} /Length {len(data)} >>\nstream\n")
+        self.write(data)
+        self.write("\nendstream\n")
+        self.end()
+
+    def finish(self, root):
+        xref = self.position
+        count = max(self.offsets) + 1
+        self.write(f"xref\n0 {count}\n0000000000 65535 f \n")
+        for number in range(1, count):
+            self.write(f"{self.offsets.get(number, 0):010d} 00000 n \n")
+        self.write(f"trailer\n<< /Size {count} /Root {root} 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+
+
+def _pdf_color(hex_color):
+    return " ".join(_num(c / 255) for c in hex_to_rgb(hex_color))
+
+
+def _pdf_rounded(x, y, box, corners):
+    nw, ne, se, sw = corners
+    r = box / 2
+    k = r * KAPPA
+    ops = [f"{_num(x + (r if nw else 0))} {y} m", f"{_num(x + box - (r if ne else 0))} {y} l"]
+    if ne:
+        ops.append(f"{_num(x + box - r + k)} {y} {x + box} {_num(y + r - k)} {x + box} {_num(y + r)} c")
+    ops.append(f"{x + box} {_num(y + box - (r if se else 0))} l")
+    if se:
+        ops.append(f"{x + box} {_num(y + box - r + k)} {_num(x + box - r + k)} {y + box} "
+                   f"{_num(x + box - r)} {y + box} c")
+    ops.append(f"{_num(x + (r if sw else 0))} {y + box} l")
+    if sw:
+        ops.append(f"{_num(x + r - k)} {y + box} {x} {_num(y + box - r + k)} {x} {_num(y + box - r)} c")
+    ops.append(f"{x} {_num(y + (r if nw else 0))} l")
+    if nw:
+        ops.append(f"{x} {_num(y + r - k)} {_num(x + r - k)} {y} {_num(x + r)} {y} c")
+    ops.append("h")
+    return "\n".join(ops) + "\n"
+
+
+def _pdf_circle(cx, cy, r):
+    k = r * KAPPA
+    return (f"{_num(cx + r)} {_num(cy)} m\n"
+            f"{_num(cx + r)} {_num(cy + k)} {_num(cx + k)} {_num(cy + r)} {_num(cx)} {_num(cy + r)} c\n"
+            f"{_num(cx - k)} {_num(cy + r)} {_num(cx - r)} {_num(cy + k)} {_num(cx - r)} {_num(cy)} c\n"
+            f"{_num(cx - r)} {_num(cy - k)} {_num(cx - k)} {_num(cy - r)} {_num(cx)} {_num(cy - r)} c\n"
+            f"{_num(cx + k)} {_num(cy - r)} {_num(cx + r)} {_num(cy - k)} {_num(cx + r)} {_num(cy)} c\n"
+            "h\n")
+
+
+def write_pdf(f, matrix, options):
+    """Write a single-page PDF to the binary file ``f``.
+
+    One unit is one point and each module is ``box_size`` points wide. The
+    page content is deflated as it is generated and its length is written
+    afterwards as an indirect object, so the document is never held in
+    memory.
+    """
+    box = options.box_size
+    offset = options.border * box
+    pixel_size = (matrix.size + options.border * 2) * box
+    has_logo = bool(options.logo_path and logo_fingerprint(options.logo_path))
+
+    pdf = _PdfWriter(f)
+    pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    pdf.obj(1, "<< /Type /Catalog /Pages 2 0 R >>")
+    pdf.obj(2, "<< /Type /Pages /Kids [3 0 R] /Count 1 >>")
+    resources = "<< /XObject << /Logo 6 0 R >> >>" if has_logo else "<< >>"
+    pdf.obj(3, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {pixel_size} {pixel_size}] "
+               f"/Resources {resources} /Contents 4 0 R >>")
+
+    pdf.begin(4)
+    pdf.write("<< /Length 5 0 R /Filter /FlateDecode >>\nstream\n")
+    start = pdf.position
+    compressor = zlib.compressobj()
+
+    def emit(text):
+        data = compressor.compress(text.encode('latin-1'))
+        if data:
+            pdf.write(data)
+
+    # Flip the y axis so rows run top to bottom, as in the raster output
+    emit(f"q\n1 0 0 -1 0 {pixel_size} cm\n")
+    emit(f"{_pdf_color(options.bg_color)} rg\n0 0 {pixel_size} {pixel_size} re f\n")
+    emit(f"{_pdf_color(options.fg_color)} rg\n")
+    for shape in iter_shapes(matrix, options.module_style):
+        x = offset + shape[2] * box
+        y = offset + shape[1] * box
+        if shape[0] == 'rect':
+            emit(f"{x} {y} {shape[4] * box} {shape[3] * box} re\n")
+        elif shape[0] == 'circle':
+            emit(_pdf_circle(x + box / 2, y + box / 2, box / 2))
+        else:
+            emit(_pdf_rounded(x, y, box, shape[3]))
+    emit("f\n")
+
+    if has_logo:
+        (pad_pos, pad_size), (logo_pos, logo_size) = logo_box(pixel_size, options.logo_percent)
+        emit(f"{_pdf_color(options.bg_color)} rg\n{pad_pos} {pad_pos} {pad_size} {pad_size} re f\n")
+        emit(f"q\n{logo_size} 0 0 {-logo_size} {logo_pos} {logo_pos + logo_size} cm\n/Logo Do\nQ\n")
+    emit("Q\n")
+
+    pdf.write(compressor.flush())
+    length = pdf.position - start
+    pdf.write("\nendstream\n")
+    pdf.end()
+    pdf.obj(5, str(length))
+
+    if has_logo:
+        _write_pdf_logo(pdf, options)
+    pdf.finish(root=1)
+
+
+def _write_pdf_logo(pdf, options):
+    """Embed the logo once at its native resolution, with its alpha as a soft mask"""
+    logo = load_logo(options.logo_path, logo_fingerprint(options.logo_path)).convert('RGBA')
+    size = f"/Width {logo.width} /Height {logo.height} /BitsPerComponent 8 /Filter /FlateDecode"
+    pdf.stream(6, f"/Type /XObject /Subtype /Image {size} /ColorSpace /DeviceRGB /SMask 7 0 R",
+               zlib.compress(logo.convert('RGB').tobytes()))
+    pdf.stream(7, f"/Type /XObject /Subtype /Image {size} /ColorSpace /DeviceGray",
+               zlib.compress(logo.getchannel('A').tobytes()))
+
+
+@metrics.timed('export_vector')
+def save_vector(file_path, matrix, options, fmt=None):
+    """Export ``matrix`` as SVG or PDF, chosen by ``fmt`` or the file extension"""
+    fmt = (fmt or os.path.splitext(file_path)[1].lstrip('.')).lower()
+    if fmt == 'svg':
+        with open(file_path, 'w', encoding='utf-8') as f:
+            write_svg(f, matrix, options)
+    elif fmt == 'pdf':
+        with open(file_path, 'wb') as f:
+            write_pdf(f, matrix, options)
+    else:
+        raise ValueError(f"Unsupported vector format: {fmt}")
@@ -0,0 +1,97 @@
+"""Decode-back verification of rendered codes with an optional local decoder"""
+from qr_render import ERROR_LEVEL_ALIASES, render_qr
+
+try:
+    import zxingcpp
+except ImportError:
+    zxingcpp = None
+
+try:
+    from pyzbar import pyzbar
+except ImportError:  # also raised when the zbar library itself is missing
+    pyzbar = None
+
+
+# Error correction levels from weakest to strongest
+LEVEL_ORDER = tuple(ERROR_LEVEL_ALIASES.values())
+MIN_LOGO_PERCENT = 4
+LOGO_PERCENT_STEP = 2
+
+
+class DecoderUnavailable(Exception):
+    pass
+
+
+def decoder_name():
+    """Name of the decoder verification will use, or None if none is installed"""
+    if zxingcpp is not None:
+        return 'zxing-cpp'
+    if pyzbar is not None:
+        return 'pyzbar'
+    return None
+
+
+def decode(img):
+    """Return the text of every QR code found in ``img``"""
+    if zxingcpp is not None:
+        return [result.text for result in
+                zxingcpp.read_barcodes(img, formats=zxingcpp.BarcodeFormat.QRCode)]
+    if pyzbar is not None:
+        return [result.data.decode('utf-8', 'replace') for result in
+                pyzbar.decode(img, symbols=[pyzbar.ZBarSymbol.QRCODE])]
+    raise DecoderUnavailable("Verification needs a QR decoder: pip install zxing-cpp (or pyzbar)")
+
+
+def scans(img, options):
+    """True if ``img`` decodes back to the content it was rendered from"""
+    return options.content in decode(img)
+
+
+def is_sampled(index, rate):
+    """Pick an evenly spread ``rate`` fraction of row indices, the same ones on every run"""
+    if rate >= 1:
+        return True
+    return int(index * rate) != int((index + 1) * rate)
+
+
+def suggest_fixes(options, render=render_qr):
+    """Find settings that make an unscannable code scan.
+
+    Returns a dict with the lowest ``error_level`` that scans with the
+    logo as it is, and the largest ``logo_percent`` that scans at the
+    current level. Either is None when nothing in range works.
+    """
+    suggestion = {'error_level': None, 'logo_percent': None}
+    start = LEVEL_ORDER.index(options.error_level) + 1 if options.error_level in LEVEL_ORDER else 0
+    for level in LEVEL_ORDER[start:]:
+        candidate = options._replace(error_level=level)
+        if scans(render(candidate), candidate):
+            suggestion['error_level'] = level
+            break
+    if options.logo_path:
+        percent = options.logo_percent - LOGO_PERCENT_STEP
+        while percent >= MIN_LOGO_PERCENT:
+            candidate = options._replace(logo_percent=percent)
+            if scans(render(candidate), candidate):
+                suggestion['logo_percent'] = percent
+                break
+            percent -= LOGO_PERCENT_STEP
+    return suggestion
+
+
+def describe(suggestion):
+    """One line of advice for a code that failed to scan"""
+    fixes = []
+    if suggestion.get('error_level'):
+        fixes.append(f"use error correction {suggestion['error_level']}")
+    if suggestion.get('logo_percent'):
+        fixes.append(f"shrink the logo to {suggestion['logo_percent']}% of the width")
+    return " or ".join(fixes) if fixes else "no smaller logo or higher error correction scans"
+
+
+def verify_result(img, options, suggest=False, render=render_qr):
+    """Fields to merge into a result record: ``scans`` plus ``suggestion`` on failure"""
+    fields = {'scans': scans(img, options)}
+    if not fields['scans'] and suggest:
+        fields['suggestion'] = suggest_fixes(options, render)
+    return fields
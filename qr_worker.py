@@ -0,0 +1,94 @@
+"""Background render thread with a single-slot, latest-request-wins queue"""
+import threading
+import time
+
+
+class RenderCancelled(Exception):
+    """Raised when a render is abandoned because a newer request superseded it"""
+
+
+class RenderResult:
+    __slots__ = ('generation', 'value', 'error', 'elapsed')
+
+    def __init__(self, generation, value=None, error=None, elapsed=0.0):
+        self.generation = generation
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+
+class RenderWorker:
+    """Runs render jobs on one daemon thread.
+
+    Only the newest submitted job is ever waiting: submitting replaces
+    whatever had not started yet. A job that is already running is handed
+    an ``is_stale`` callable it can check between stages to give up early
+    (by raising RenderCancelled), and a stale result that still completes
+    is dropped rather than reported. Nothing here touches Tk. The GUI picks
+    finished results up with ``poll`` from its own thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = None
+        self._result = None
+        self._generation = 0
+        self._running = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='qr-render', daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        with self._cond:
+            return self._running or self._pending is not None or self._result is not None
+
+    def submit(self, job):
+        """Queue ``job(is_stale)``, replacing any job that has not started yet"""
+        with self._cond:
+            self._generation += 1
+            self._pending = (self._generation, job)
+            self._cond.notify()
+            return self._generation
+
+    def poll(self):
+        """Return the newest finished RenderResult, or None if there is nothing new"""
+        with self._cond:
+            result, self._result = self._result, None
+            return result
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._pending = None
+            self._cond.notify()
+
+    def _is_stale(self, generation):
+        return self._generation != generation or self._stopped
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                generation, job = self._pending
+                self._pending = None
+                self._running = True
+
+            start = time.perf_counter()
+            result = RenderResult(generation)
+            try:
+                result.value = job(lambda: self._is_stale(generation))
+            except RenderCancelled:
+                result = None
+            except Exception as e:
+                result.error = e
+            if result is not None:
+                result.elapsed = time.perf_counter() - start
+
+            with self._cond:
+                self._running = False
+                if result is not None and not self._is_stale(generation):
+                    self._result = result
@@ -0,0 +1,82 @@
+import pytest
+
+from qr_bench import make_bench_logo
+from qr_cache import LRUCache, RenderCache, RenderPipeline
+from qr_render import RenderOptions
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(3, lambda value: 1)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    assert cache.get('a') == 'A'  # now b is the oldest
+    cache.put('d', 'D')
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['A', 'C', 'D']
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (4, 1, 1)
+    assert (stats['entries'], stats['bytes']) == (3, 3)
+
+
+def test_lru_evicts_by_size():
+    cache = LRUCache(10, len)
+    cache.put('a', 'x' * 4)
+    cache.put('b', 'x' * 4)
+    cache.put('c', 'x' * 4)
+    assert len(cache) == 2
+    assert cache.get('a') is None
+    cache.put('huge', 'x' * 11)  # larger than the whole cache, so never stored
+    assert cache.get('huge') is None
+    assert cache.current_bytes == 8
+
+
+def test_lru_replacing_a_key_updates_its_size():
+    cache = LRUCache(10, len)
+    cache.put('a', 'x' * 6)
+    cache.put('a', 'x' * 2)
+    assert cache.current_bytes == 2
+    assert cache.evictions == 0
+
+
+def test_pipeline_reruns_only_changed_stages(tmp_path):
+    pipeline = RenderPipeline(RenderCache(image_bytes=0))
+    options = RenderOptions("stages", logo_path=make_bench_logo(str(tmp_path)), box_size=4)
+    pipeline.render(options)
+    assert pipeline.stage_runs == {'encode': 1, 'draw': 1, 'logo': 1}
+
+    pipeline.render(options._replace(logo_percent=15))
+    assert pipeline.stage_runs == {'encode': 1, 'draw': 1, 'logo': 2}
+
+    pipeline.render(options._replace(fg_color="#123456"))
+    assert pipeline.stage_runs == {'encode': 1, 'draw': 2, 'logo': 3}
+
+    pipeline.render(options._replace(content="other"))
+    assert pipeline.stage_runs == {'encode': 2, 'draw': 3, 'logo': 4}
+
+
+def test_pipeline_reuses_cached_images():
+    pipeline = RenderPipeline(RenderCache())
+    first = RenderOptions("cached", box_size=4)
+    img = pipeline.render(first)
+    pipeline.render(first._replace(module_style="Circle"))
+    assert pipeline.render(first) is img
+    assert pipeline.stage_runs == {'encode': 1, 'draw': 2, 'logo': 2}
+
+
+def test_pipeline_invalidate_reruns_later_stages():
+    pipeline = RenderPipeline(RenderCache(image_bytes=0))
+    options = RenderOptions("invalidate", box_size=4)
+    pipeline.render(options)
+    pipeline.invalidate('draw')
+    pipeline.render(options)
+    assert pipeline.stage_runs == {'encode': 1, 'draw': 2, 'logo': 2}
+
+
+def test_strict_logo(tmp_path):
+    options = RenderOptions("logo", logo_path=str(tmp_path / 'missing.png'), box_size=4)
+    without_logo = RenderCache().render(options._replace(logo_path=None))
+    assert RenderCache().render(options).tobytes() == without_logo.tobytes()
+    with pytest.raises(FileNotFoundError):
+        RenderCache(strict_logo=True).render(options)
+    with pytest.raises(FileNotFoundError):
+        RenderPipeline(RenderCache(strict_logo=True)).render(options)
@@ -0,0 +1,14 @@
+"""The ``selfcheck`` command as a test: fast renderers against qrcode's StyledPilImage"""
+from qr_selfcheck import check_bands, check_styles, describe_case, make_logos
+
+
+def test_styles_match_styled_pil_image(tmp_path):
+    cases, mismatches = check_styles(make_logos(str(tmp_path)))
+    assert cases
+    assert not mismatches, [describe_case(options) for options in mismatches]
+
+
+def test_bands_match_render_qr(tmp_path):
+    cases, mismatches = check_bands(make_logos(str(tmp_path))[:2], str(tmp_path))
+    assert cases
+    assert not mismatches, [f"{what}: {describe_case(options)}" for options, what in mismatches]
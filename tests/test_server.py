@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from qr_bench import make_bench_logo
+from qr_server import QRRenderService, make_server
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    """A one-worker service on a free port, with a good and a broken logo"""
+    logo_dir = str(tmp_path_factory.mktemp('logos'))
+    make_bench_logo(logo_dir)
+    with open(os.path.join(logo_dir, 'broken.png'), 'wb') as f:
+        f.write(b'not a png')
+    service = QRRenderService(workers=1, logo_dir=logo_dir,
+                              cache_dir=str(tmp_path_factory.mktemp('cache')))
+    httpd = make_server(service, port=0, quiet=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    service.close()
+
+
+def fetch(url, headers=None):
+    """``(status, headers, body)`` of a GET, error statuses included"""
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_render(server):
+    status, headers, body = fetch(f"{server}/qr?content=hello&size=4")
+    assert status == 200
+    assert headers['Content-Type'] == 'image/png'
+    assert body.startswith(b'\x89PNG')
+    assert headers['ETag'].startswith('"')
+    assert headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+
+def test_etag_follows_options(server):
+    first = fetch(f"{server}/qr?content=hello&size=4")[1]['ETag']
+    assert fetch(f"{server}/qr?content=hello&size=4")[1]['ETag'] == first
+    assert fetch(f"{server}/qr?content=hello&size=5")[1]['ETag'] != first
+    assert fetch(f"{server}/qr?content=hello&size=4&format=svg")[1]['ETag'] != first
+
+
+def test_if_none_match_gets_304(server):
+    url = f"{server}/qr?content=hello&size=4"
+    etag = fetch(url)[1]['ETag']
+    status, headers, body = fetch(url, {'If-None-Match': f'"other", {etag}'})
+    assert status == 304
+    assert headers['ETag'] == etag
+    assert body == b''
+
+
+def test_logo_responses_revalidate(server):
+    status, headers, _ = fetch(f"{server}/qr?content=hello&size=4&logo=bench_logo")
+    assert status == 200
+    assert headers['Cache-Control'] == 'public, no-cache'
+
+
+@pytest.mark.parametrize('query', [
+    'size=4',
+    'content=hi&size=0',
+    'content=hi&size=51',
+    'content=hi&border=17',
+    'content=hi&logo_percent=41',
+    'content=hi&fg=red',
+    'content=hi&ec=X',
+    'content=hi&format=gif',
+    'content=hi&logo=missing',
+    'content=hi&logo=..%2Fbench_logo',
+    'content=' + 'x' * 4097,
+    'content=' + '~' * 3000 + '&ec=H',
+])
+def test_bad_requests_get_400(server, query):
+    status, _, body = fetch(f"{server}/qr?{query}")
+    assert status == 400
+    assert json.loads(body)['error']
+
+
+def test_broken_logo_fails(server):
+    status, _, body = fetch(f"{server}/qr?content=hello&size=4&logo=broken")
+    assert status == 500
+    assert 'cannot identify image file' in json.loads(body)['error']
+
+
+def test_health(server):
+    fetch(f"{server}/qr?content=health&size=4")
+    status, _, body = fetch(f"{server}/health")
+    stats = json.loads(body)
+    assert status == 200
+    assert stats['workers'] == 1
+    assert stats['renders'] >= 1
+    assert stats['disk']['bytes'] > 0
+    (caches,) = stats['render_caches'].values()
+    assert set(caches) == {'matrix', 'image', 'fit'}
+    assert caches['image']['entries'] >= 1
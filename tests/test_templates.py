@@ -0,0 +1,29 @@
+from qr_templates import fit_version, parse_ids, version_sorted_rows
+
+
+def test_parse_ids():
+    assert list(parse_ids("1-3")) == [1, 2, 3]
+    assert list(parse_ids("1-3,7, ,10-14:2")) == [1, 2, 3, 7, 10, 12, 14]
+    assert list(parse_ids("5")) == [5]
+    assert list(parse_ids("")) == []
+
+
+def test_version_sorted_rows_groups_by_version():
+    ids = [10 ** 60, 1, 10 ** 30, 2, 10 ** 60 + 1]
+    rows, counts = version_sorted_rows(ids, "https://example.com/c/{id}", "code_{id}", "Medium (15%)")
+    versions = [fit_version(row['content'], "Medium (15%)") for _, row in rows]
+    # Sorted by version, and by input order within a version
+    keys = [(version, index) for version, (index, _) in zip(versions, rows)]
+    assert keys == sorted(keys)
+    assert counts == {version: versions.count(version) for version in versions}
+    assert len(counts) == 3
+    assert rows[0] == (1, {'content': "https://example.com/c/1", 'filename': "code_1"})
+
+
+def test_version_sorted_rows_matches_fit_version():
+    # Contents whose chunk signatures match must encode at the same version
+    ids = list(range(1, 2000, 37)) + ['abc', 'ABC', 'a' * 40]
+    rows, _ = version_sorted_rows(ids, "{id}", "{id}", "High (30%)")
+    versions = [fit_version(row['content'], "High (30%)") for _, row in rows]
+    assert versions == sorted(versions)
+    assert sorted(index for index, _ in rows) == list(range(len(ids)))
@@ -0,0 +1,23 @@
+from qr_verify import is_sampled
+
+
+def test_full_rate_samples_everything():
+    assert all(is_sampled(index, 1) for index in range(50))
+    assert all(is_sampled(index, 2) for index in range(50))
+
+
+def test_sample_is_evenly_spread():
+    picked = [index for index in range(1000) if is_sampled(index, 0.1)]
+    assert len(picked) == 100
+    assert {b - a for a, b in zip(picked, picked[1:])} == {10}
+    assert [index for index in range(10) if is_sampled(index, 0.5)] == [1, 3, 5, 7, 9]
+
+
+def test_sample_is_stable():
+    first = [is_sampled(index, 0.37) for index in range(500)]
+    assert [is_sampled(index, 0.37) for index in range(500)] == first
+    assert sum(first) == int(500 * 0.37)
+
+
+def test_zero_rate_samples_nothing():
+    assert not any(is_sampled(index, 0) for index in range(50))